@@ -0,0 +1,84 @@
+import copy
+import hashlib
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import LRUCache
+
+
+class TokenCache:
+    """Recently used API tokens with their users.
+
+    Tokens are kept in a bounded in-process LRU cache for timeout seconds,
+    or in the Django cache named by alias. Entries are only dropped from
+    the cache of the process deleting the token or saving the user, so
+    with the in-process cache, or with an alias of a cache that is not
+    shared, such as the local memory one, the other worker processes keep
+    accepting a deleted token and seeing the old user until the entry
+    expires. Fields updated without saving the user, such as the shopping
+    cart version, are not refreshed either. Every hit returns copies, so
+    requests never share a user instance.
+    """
+
+    def __init__(self, max_size, timeout, alias=None):
+        self.timeout = timeout
+        self.alias = alias
+        self.tokens = LRUCache(max_size, sizeof=lambda entry: 1)
+
+    def get_cache_key(self, key):
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        if self.alias is not None:
+            return caches[self.alias].get(self.get_cache_key(key))
+        entry = self.tokens.get(key)
+        if entry is None or monotonic() - entry[1] > self.timeout:
+            return None
+        token = copy.copy(entry[0])
+        token.user = copy.copy(entry[0].user)
+        return token
+
+    def set(self, token):
+        if self.alias is not None:
+            caches[self.alias].set(
+                self.get_cache_key(token.key), token, self.timeout)
+            return
+        cached = copy.copy(token)
+        cached.user = copy.copy(token.user)
+        self.tokens.set(token.key, (cached, monotonic()))
+
+    def delete(self, keys):
+        if self.alias is not None:
+            caches[self.alias].delete_many(
+                [self.get_cache_key(key) for key in keys])
+            return
+        for key in keys:
+            self.tokens.delete(key)
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE,
+    settings.AUTH_TOKEN_CACHE_TIMEOUT,
+    settings.AUTH_TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication skipping the token query for recent tokens.
+
+    Cached tokens are dropped when they are deleted, for instance on
+    logout, and when their user is saved, which covers password changes
+    and deactivation. Unless the token cache is shared, other worker
+    processes only notice these changes after AUTH_TOKEN_CACHE_TIMEOUT.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(token)
+        return user, token
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache bounded by the total size of values.
+
+    The size of a value is computed with the sizeof callable, len() by
+    default. Values larger than the whole cache are never stored.
+    """
+
+    def __init__(self, max_size, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            return self.items[key][0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self.lock:
+            self._pop(key)
+            if size > self.max_size:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                self._pop(next(iter(self.items)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        if key in self.items:
+            self.size -= self.items.pop(key)[1]
@@ -0,0 +1,52 @@
+import gzip
+
+import brotli
+from django.conf import settings
+
+# Content codings in the order of preference for equal quality values.
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'text/csv', 'text/html',
+    'text/plain',
+)
+
+
+def choose_encoding(accept_encoding):
+    """Returns the best content coding allowed by Accept-Encoding, or None."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    candidates = [
+        (qualities.get(encoding, qualities.get('*', 0.0)), -index, encoding)
+        for index, encoding in enumerate(ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def compress(body, encoding, best=False):
+    """Compresses the body with the content coding.
+
+    Responses are compressed at the configured levels, which trade ratio
+    for CPU time. Bodies built once and cached are compressed with best.
+    """
+    if encoding == 'br':
+        return brotli.compress(
+            body, quality=11 if best else settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(
+        body, compresslevel=9 if best else settings.COMPRESSION_GZIP_LEVEL,
+        mtime=0)
+
+
+def is_compressible(response):
+    """Returns whether the response has a compressible content type."""
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type in COMPRESSIBLE_TYPES
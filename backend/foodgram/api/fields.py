@@ -0,0 +1,94 @@
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class PreloadingManyRelatedField(serializers.ManyRelatedField):
+    """Many related field loading all the submitted objects with one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.preload(data)
+        return super().to_internal_value(data)
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key related field that looks up objects loaded in bulk.
+
+    Call preload() with all the primary keys that are going to be
+    validated to fetch them with a single query. Values that were not
+    preloaded are validated the usual way, so errors stay the same.
+    """
+
+    preloaded = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return PreloadingManyRelatedField(**list_kwargs)
+
+    def preload(self, values):
+        try:
+            objects = self.get_queryset().in_bulk(values)
+        except (TypeError, ValueError):
+            self.preloaded = None
+        else:
+            self.preloaded = {str(pk): obj for pk, obj in objects.items()}
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None and str(data) in self.preloaded:
+            return self.preloaded[str(data)]
+        return super().to_internal_value(data)
+
+
+def accepts_webp(request):
+    """Tells if the client asked for WebP images in the Accept header."""
+    return (
+        request is not None
+        and 'image/webp' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def get_image_url(storage, name, thumbnails, size, request):
+    """Returns the URL of the image thumbnail of the size.
+
+    The URL of the image itself is returned when size is None or the
+    thumbnail is missing. URLs are absolute when there is a request.
+    """
+    if not name:
+        return None
+    if size is not None:
+        name = thumbnails.get(size, {}).get(
+            'webp' if accepts_webp(request) else 'jpeg') or name
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class ThumbnailImageField(serializers.ImageField):
+    """Read-only field returning a pre-rendered thumbnail of a recipe image.
+
+    JPEG thumbnails are returned unless the client accepts WebP. The full
+    image is returned when the thumbnail is missing, or when list_only is
+    set and the view action is not a list.
+    """
+
+    def __init__(self, size, list_only=False, **kwargs):
+        self.size = size
+        self.list_only = list_only
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        view = self.context.get('view')
+        size = None
+        if not self.list_only or getattr(view, 'action', None) == 'list':
+            size = self.size
+        return get_image_url(
+            value.storage, value.name, value.instance.thumbnails, size,
+            self.context.get('request'))
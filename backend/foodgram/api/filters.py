@@ -1,6 +1,7 @@
-from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models import (BooleanField, Exists, ExpressionWrapper,
+                              OuterRef, Q)
 from django_filters import rest_framework as rf_filters
-from recipes.models import Ingredient, Recipe
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
 
 
 class IngredientFilter(rf_filters.FilterSet):
@@ -13,6 +14,7 @@ class IngredientFilter(rf_filters.FilterSet):
         fields = ['name']
 
     def startswith_contains_union_method(self, queryset, name, value):
+        value = value.strip()
         if not bool(value):
             return queryset
         startswith_lookup = '__'.join([name, 'istartswith'])
@@ -24,7 +26,7 @@ class IngredientFilter(rf_filters.FilterSet):
                 Q(**{startswith_lookup: value}),
                 output_field=BooleanField()
             )
-        ).order_by('-is_start')
+        ).order_by('-is_start', 'pk')
 
 
 class RecipeFilter(rf_filters.FilterSet):
@@ -35,18 +37,22 @@ class RecipeFilter(rf_filters.FilterSet):
     is_in_shopping_cart = rf_filters.NumberFilter(
         method='recipe_boolean_methods')
 
+    boolean_method_models = {
+        'is_favorited': Favorite,
+        'is_in_shopping_cart': ShoppingCart,
+    }
+
     class Meta:
         model = Recipe
         fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
 
     def recipe_boolean_methods(self, queryset, name, value):
-        if not bool(value):
-            return queryset
         user = self.request.user
         if user.is_anonymous:
             return queryset
-        recipe_ids = [
-            r.pk for r in queryset if getattr(r, name)(user) == value]
-        if recipe_ids:
-            return queryset.filter(pk__in=recipe_ids)
-        return queryset.none()
+        model = self.boolean_method_models[name]
+        user_has_recipe = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk')))
+        if value:
+            return queryset.filter(user_has_recipe)
+        return queryset.exclude(user_has_recipe)
@@ -0,0 +1,324 @@
+import json
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from api.pagination import RecipeCursorPagination
+from api.recipe_cache import recipe_cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+from users.models import Subscription, User
+
+PASSWORD = 'benchmark-password'
+DEEP_PAGE = 1000
+
+
+def endpoint(name, method, url, data=None, setup=None):
+    """Describes a benchmarked request.
+
+    Requests whose names end with -anonymous are sent without credentials.
+    The setup callable runs in the same rolled-back transaction before the
+    request is sent, but is not measured.
+    """
+    return {
+        'name': name, 'method': method, 'url': url,
+        'data': data, 'setup': setup,
+    }
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of the values."""
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+class Command(BaseCommand):
+    """Benchmarks every API route with the Django test client."""
+
+    help = (
+        'Sends requests to every route of the API with the Django test '
+        'client and reports p50/p95 latency, SQL queries and response '
+        'size per endpoint. Every request runs in a rolled-back '
+        'transaction and uploaded images are saved to a temporary '
+        'directory, so the database and the media files are left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of timed requests per endpoint.')
+        parser.add_argument(
+            '--only', nargs='+', default=[],
+            help='Names of the endpoints to benchmark.')
+        parser.add_argument(
+            '--output', help='Path of the JSON file to save results to.')
+        parser.add_argument(
+            '--compare', help='Path of a JSON file with previous results.')
+
+    def handle(self, *args, **options):
+        with TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                results = self.run_benchmark(options)
+
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+        self.report(results, previous)
+        cache_stats = recipe_cache.stats()
+        self.stdout.write(
+            f'Anonymous recipe cache: {cache_stats["hits"]} hits, '
+            f'{cache_stats["misses"]} misses, '
+            f'hit ratio {cache_stats["hit_ratio"]:.2f}'
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'created': datetime.now(timezone.utc).isoformat(),
+                    'database': connection.vendor,
+                    'repeat': options['repeat'],
+                    'dataset': {
+                        'users': User.objects.count(),
+                        'recipes': Recipe.objects.count(),
+                        'ingredients': Ingredient.objects.count(),
+                    },
+                    'recipe_cache': cache_stats,
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Results saved to {options["output"]}')
+
+    def run_benchmark(self, options):
+        results = {}
+        with transaction.atomic():
+            self.prepare()
+            for current in self.get_endpoints():
+                if options['only'] and current['name'] not in options['only']:
+                    continue
+                results[current['name']] = self.measure(
+                    current, options['repeat'])
+            transaction.set_rollback(True)
+        return results
+
+    def prepare(self):
+        """Picks the benchmark user and the objects for detail routes."""
+        self.user = User.objects.filter(
+            follower__isnull=False, shopping__isnull=False
+        ).first() or User.objects.first()
+        self.recipe = Recipe.objects.exclude(author=self.user).first()
+        self.own_recipe = Recipe.objects.filter(author=self.user).first()
+        self.tag = Tag.objects.first()
+        self.ingredient = Ingredient.objects.first()
+        if not all((self.user, self.recipe, self.tag, self.ingredient)):
+            raise CommandError(
+                'Not enough data to benchmark, run generate_dataset first.')
+        self.author = self.recipe.author
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.anonymous_client = APIClient(SERVER_NAME='localhost')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_endpoints(self):
+        """Returns the descriptions of all the benchmarked requests."""
+        recipe_data = {
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 10}],
+            'name': 'Benchmark recipe',
+            'image': (
+                'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAA'
+                'LAAAAAABAAEAAAIBRAA7'
+            ),
+            'text': 'Benchmark recipe',
+            'cooking_time': 10,
+        }
+        recipe_url = f'/api/recipes/{self.recipe.pk}/'
+        deep_page, deep_cursor_url = self.get_deep_page()
+        endpoints = [
+            endpoint('users-list', 'get', '/api/users/'),
+            endpoint('users-create', 'post', '/api/users/', {
+                'email': 'benchmark@foodgram.local',
+                'username': 'benchmark',
+                'first_name': 'Benchmark',
+                'last_name': 'User',
+                'password': PASSWORD,
+            }),
+            endpoint('users-detail', 'get', f'/api/users/{self.author.pk}/'),
+            endpoint('users-me', 'get', '/api/users/me/'),
+            endpoint(
+                'users-set-password', 'post', '/api/users/set_password/', {
+                    'current_password': PASSWORD,
+                    'new_password': PASSWORD,
+                }),
+            endpoint(
+                'users-subscriptions', 'get',
+                '/api/users/subscriptions/?recipes_limit=3'),
+            endpoint(
+                'users-subscriptions-cursor', 'get',
+                '/api/users/subscriptions/?recipes_limit=3'
+                '&pagination=cursor'),
+            endpoint(
+                'users-subscribe', 'post',
+                f'/api/users/{self.author.pk}/subscribe/',
+                setup=self.unsubscribe),
+            endpoint(
+                'users-unsubscribe', 'delete',
+                f'/api/users/{self.author.pk}/subscribe/',
+                setup=self.subscribe),
+            endpoint('tags-list', 'get', '/api/tags/'),
+            endpoint('tags-detail', 'get', f'/api/tags/{self.tag.pk}/'),
+            endpoint('ingredients-list-anonymous', 'get', '/api/ingredients/'),
+            endpoint(
+                'ingredients-search-anonymous', 'get',
+                '/api/ingredients/?name=мол'),
+            endpoint(
+                'ingredients-detail', 'get',
+                f'/api/ingredients/{self.ingredient.pk}/'),
+            endpoint('recipes-list-anonymous', 'get', '/api/recipes/'),
+            endpoint('recipes-list', 'get', '/api/recipes/'),
+            endpoint(
+                'recipes-list-deep-page', 'get',
+                f'/api/recipes/?page={deep_page}'),
+            endpoint(
+                'recipes-list-cursor', 'get',
+                '/api/recipes/?pagination=cursor'),
+            endpoint('recipes-list-cursor-deep-page', 'get', deep_cursor_url),
+            endpoint(
+                'recipes-list-tags', 'get',
+                f'/api/recipes/?tags={self.tag.slug}'),
+            endpoint(
+                'recipes-list-favorited', 'get',
+                '/api/recipes/?is_favorited=1'),
+            endpoint(
+                'recipes-list-in-cart', 'get',
+                '/api/recipes/?is_in_shopping_cart=1'),
+            endpoint(
+                'recipes-list-author', 'get',
+                f'/api/recipes/?author={self.author.pk}'),
+            endpoint('recipes-detail-anonymous', 'get', recipe_url),
+            endpoint('recipes-detail', 'get', recipe_url),
+            endpoint('recipes-create', 'post', '/api/recipes/', recipe_data),
+            endpoint(
+                'recipes-favorite', 'post', f'{recipe_url}favorite/',
+                setup=lambda: self.remove_recipe(Favorite)),
+            endpoint(
+                'recipes-unfavorite', 'delete', f'{recipe_url}favorite/',
+                setup=lambda: self.add_recipe(Favorite)),
+            endpoint(
+                'recipes-shopping-cart', 'post', f'{recipe_url}shopping_cart/',
+                setup=lambda: self.remove_recipe(ShoppingCart)),
+            endpoint(
+                'recipes-shopping-cart-delete', 'delete',
+                f'{recipe_url}shopping_cart/',
+                setup=lambda: self.add_recipe(ShoppingCart)),
+            endpoint(
+                'recipes-download-shopping-cart', 'get',
+                '/api/recipes/download_shopping_cart/'),
+            endpoint(
+                'recipes-shopping-cart-job', 'post',
+                '/api/recipes/download_shopping_cart/jobs/',
+                {'format': 'pdf'}),
+            endpoint('auth-token-login', 'post', '/api/auth/token/login/', {
+                'email': self.user.email, 'password': PASSWORD}),
+            endpoint('auth-token-logout', 'post', '/api/auth/token/logout/'),
+        ]
+        if self.own_recipe:
+            own_recipe_url = f'/api/recipes/{self.own_recipe.pk}/'
+            endpoints += [
+                endpoint(
+                    'recipes-update', 'patch', own_recipe_url, recipe_data),
+                endpoint('recipes-delete', 'delete', own_recipe_url),
+            ]
+        return endpoints
+
+    def get_deep_page(self):
+        """Returns page DEEP_PAGE, or the last one, and its cursor URL."""
+        page_size = RecipeCursorPagination.page_size
+        deep_page = max(1, min(
+            DEEP_PAGE, (Recipe.objects.count() - 1) // page_size + 1))
+        pub_date = Recipe.objects.order_by('-pub_date', '-id').values_list(
+            'pub_date', flat=True)[(deep_page - 1) * page_size]
+        paginator = RecipeCursorPagination()
+        paginator.base_url = '/api/recipes/'
+        # Cursor positions are exclusive, so step back a microsecond to
+        # include the first recipe of the page.
+        cursor_url = paginator.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=str(pub_date + timedelta(microseconds=1))))
+        return deep_page, cursor_url
+
+    def subscribe(self):
+        Subscription.objects.get_or_create(user=self.user, author=self.author)
+
+    def unsubscribe(self):
+        Subscription.objects.filter(
+            user=self.user, author=self.author).delete()
+
+    def add_recipe(self, model):
+        model.objects.get_or_create(user=self.user, recipe=self.recipe)
+
+    def remove_recipe(self, model):
+        model.objects.filter(user=self.user, recipe=self.recipe).delete()
+
+    def send(self, current):
+        client = (
+            self.anonymous_client if current['name'].endswith('-anonymous')
+            else self.client
+        )
+        response = getattr(client, current['method'])(
+            current['url'], data=current['data'], format='json')
+        if response.streaming:
+            return response, sum(map(len, response.streaming_content))
+        return response, len(response.content)
+
+    def measure(self, current, repeat):
+        """Sends the request repeat times and sums up the measurements."""
+        timings, query_counts = [], []
+        for _ in range(repeat):
+            with transaction.atomic():
+                if current['setup']:
+                    current['setup']()
+                with CaptureQueriesContext(connection) as queries:
+                    start = perf_counter()
+                    response, size = self.send(current)
+                    timings.append((perf_counter() - start) * 1000)
+                query_counts.append(len(queries))
+                transaction.set_rollback(True)
+        return {
+            'method': current['method'].upper(),
+            'url': current['url'],
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': median(query_counts),
+            'bytes': size,
+        }
+
+    def report(self, results, previous):
+        self.stdout.write(
+            f'{"endpoint":<32} {"status":>6} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"queries":>8} {"bytes":>9}'
+            + (f' {"p50 before":>11} {"queries before":>15}'
+               if previous else '')
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<32} {result["status"]:>6} {result["p50_ms"]:>8.2f} '
+                f'{result["p95_ms"]:>8.2f} {result["queries"]:>8} '
+                f'{result["bytes"]:>9}'
+            )
+            if name in previous:
+                line += (
+                    f' {previous[name]["p50_ms"]:>11.2f} '
+                    f'{previous[name]["queries"]:>15}'
+                )
+            self.stdout.write(line)
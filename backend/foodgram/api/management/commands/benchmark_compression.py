@@ -0,0 +1,78 @@
+from statistics import median
+from time import process_time
+
+from api.compression import ENCODINGS, compress
+from api.recipe_cache import recipe_cache
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+PRECOMPRESSED = ('ingredients-list', 'tags-list')
+
+
+class Command(BaseCommand):
+    """Measures the compression of the API responses."""
+
+    help = (
+        'Reports the response size of every endpoint uncompressed and '
+        'compressed with gzip and brotli at the configured levels, and the '
+        'CPU time spent compressing it. The reference lists are compressed '
+        'once at the best levels and cached, so their CPU time is only '
+        'spent when they are rebuilt.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of timed compressions per endpoint and coding.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            follower__isnull=False, shopping__isnull=False
+        ).first() or User.objects.first()
+        recipe = Recipe.objects.first()
+        if not all((user, recipe)):
+            raise CommandError(
+                'Not enough data to benchmark, run generate_dataset first.')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        endpoints = [
+            ('ingredients-list', '/api/ingredients/'),
+            ('tags-list', '/api/tags/'),
+            ('recipes-list', '/api/recipes/'),
+            ('recipes-list-50', '/api/recipes/?limit=50'),
+            ('recipes-detail', f'/api/recipes/{recipe.pk}/'),
+            ('users-list', '/api/users/'),
+            ('users-subscriptions', '/api/users/subscriptions/'),
+        ]
+        self.stdout.write(
+            f'{"endpoint":<22}{"bytes":>9}'
+            + ''.join(
+                f'{encoding + " bytes":>12}{encoding + " ms":>9}'
+                for encoding in ENCODINGS)
+        )
+        for name, url in endpoints:
+            recipe_cache.clear()
+            response = client.get(url, HTTP_ACCEPT_ENCODING='identity')
+            if response.status_code != 200:
+                raise CommandError(f'{url} responded {response.status_code}')
+            self.report(name, response.content, options['repeat'])
+        self.stdout.write(
+            f'Responses under {settings.COMPRESSION_MIN_SIZE} bytes are '
+            f'sent uncompressed; gzip level {settings.COMPRESSION_GZIP_LEVEL}'
+            f', brotli quality {settings.COMPRESSION_BROTLI_QUALITY}.'
+        )
+
+    def report(self, name, body, repeat):
+        best = name in PRECOMPRESSED
+        line = f'{name + (" *" if best else ""):<22}{len(body):>9}'
+        for encoding in ENCODINGS:
+            times = []
+            for _ in range(repeat):
+                started = process_time()
+                compressed = compress(body, encoding, best=best)
+                times.append((process_time() - started) * 1000)
+            line += f'{len(compressed):>12}{median(times):>9.2f}'
+        self.stdout.write(line)
@@ -0,0 +1,115 @@
+import json
+from statistics import median
+from time import process_time
+
+from api.recipe_cache import recipe_cache
+from api.renderers import JSONRenderer, ORJSONRenderer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from recipes.models import Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Compares the .values() read path with the serializers."""
+
+    help = (
+        'Requests the recipe, user and subscription lists and details '
+        'with API_FAST_READS on and off, fails if the outputs differ and '
+        'reports the CPU time per request of both read paths and of '
+        'rendering the page with json and orjson.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of timed requests per page and read path.')
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Page size of the lists.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            follower__isnull=False, shopping__isnull=False
+        ).first() or User.objects.first()
+        recipe = Recipe.objects.first()
+        tag = Tag.objects.first()
+        if not all((user, recipe, tag)):
+            raise CommandError(
+                'Not enough data to benchmark, run generate_dataset first.')
+        anonymous_client = APIClient(SERVER_NAME='localhost')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        limit = options['limit']
+        pages = [
+            ('recipes-list-anonymous', anonymous_client,
+             f'/api/recipes/?limit={limit}'),
+            ('recipes-list', client, f'/api/recipes/?limit={limit}'),
+            ('recipes-list-page-2', client,
+             f'/api/recipes/?limit={limit}&page=2'),
+            ('recipes-list-cursor', client,
+             f'/api/recipes/?limit={limit}&pagination=cursor'),
+            ('recipes-list-tags', client,
+             f'/api/recipes/?limit={limit}&tags={tag.slug}'),
+            ('recipes-list-in-cart', client,
+             f'/api/recipes/?limit={limit}&is_in_shopping_cart=1'),
+            ('recipes-detail-anonymous', anonymous_client,
+             f'/api/recipes/{recipe.pk}/'),
+            ('recipes-detail', client, f'/api/recipes/{recipe.pk}/'),
+            ('users-list', client, f'/api/users/?limit={limit}'),
+            ('users-detail', client, f'/api/users/{recipe.author_id}/'),
+            ('users-subscriptions', client,
+             f'/api/users/subscriptions/?limit={limit}&recipes_limit=3'),
+            ('users-subscriptions-cursor', client,
+             f'/api/users/subscriptions/?limit={limit}&pagination=cursor'),
+        ]
+        self.stdout.write(
+            f'{"page":<28}{"serializers":>12}{"values":>10}{"speedup":>9}'
+            f'{"json":>9}{"orjson":>9}  (CPU ms per request)'
+        )
+        with transaction.atomic():
+            for name, current_client, url in pages:
+                self.compare(
+                    name, current_client, url, options['repeat'])
+            transaction.set_rollback(True)
+
+    def request(self, client, url, fast):
+        # Anonymous recipe responses would be served from the cache.
+        recipe_cache.clear()
+        with override_settings(API_FAST_READS=fast):
+            response = client.get(url, HTTP_ACCEPT='application/json')
+        if response.status_code != 200:
+            raise CommandError(f'{url} responded {response.status_code}')
+        return response
+
+    def measure(self, function, repeat):
+        times = []
+        for _ in range(repeat):
+            started = process_time()
+            function()
+            times.append((process_time() - started) * 1000)
+        return median(times)
+
+    def compare(self, name, client, url, repeat):
+        expected = json.loads(self.request(client, url, False).content)
+        actual = json.loads(self.request(client, url, True).content)
+        if actual != expected:
+            raise CommandError(
+                f'{name}: the .values() output differs from the serializers'
+                f'\n{json.dumps(expected, ensure_ascii=False)[:2000]}'
+                f'\n{json.dumps(actual, ensure_ascii=False)[:2000]}'
+            )
+        slow = self.measure(
+            lambda: self.request(client, url, False), repeat)
+        fast = self.measure(
+            lambda: self.request(client, url, True), repeat)
+        json_time = self.measure(
+            lambda: JSONRenderer().render(expected), repeat)
+        orjson_time = self.measure(
+            lambda: ORJSONRenderer().render(expected), repeat)
+        self.stdout.write(
+            f'{name:<28}{slow:>12.2f}{fast:>10.2f}{slow / fast:>8.1f}x'
+            f'{json_time:>9.3f}{orjson_time:>9.3f}'
+        )
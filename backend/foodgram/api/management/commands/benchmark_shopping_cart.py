@@ -0,0 +1,160 @@
+import tracemalloc
+from io import BytesIO
+from statistics import median
+from time import perf_counter
+
+from api.pdf import FONT_NAME, FONT_PATH
+from api.shopping_list import (documents_cache, get_shopping_list,
+                               layout_shopping_list)
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, RecipeIngredients, ShoppingCart
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import registerFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.test import APIClient
+from users.models import User
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client):
+    """Requests the shopping list rendered anew, not the cached document."""
+    documents_cache.clear()
+    return client.get(DOWNLOAD_URL).streaming_content
+
+
+def measure_peak_memory(function):
+    """Returns the peak memory allocated by the function call in KiB."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def render_with_canvas(shopping_list):
+    """Renders the shopping list the way it was done before streaming.
+
+    The whole document is built in memory by the reportlab canvas and the
+    font file is parsed on every call. Kept as the benchmark baseline.
+    """
+    buffer = BytesIO()
+    paper_sheet = canvas.Canvas(buffer, pagesize=A4)
+    registerFont(TTFont(FONT_NAME, FONT_PATH))
+    for page in layout_shopping_list(shopping_list):
+        for font_size, x, y, text in page:
+            paper_sheet.setFont(FONT_NAME, font_size)
+            paper_sheet.drawString(x, y, text)
+        paper_sheet.showPage()
+    paper_sheet.save()
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    """Measures the shopping cart download for carts of different sizes."""
+
+    help = (
+        'Measures queries, time to first byte, wall time and peak memory '
+        'of the shopping cart download for carts of different sizes and '
+        'compares them with in-memory canvas rendering. All the data is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1, 10, 100],
+            help='Numbers of recipes in the cart to measure.')
+        parser.add_argument(
+            '--ingredients', type=int, default=15,
+            help='Number of ingredients in every recipe.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed requests for every cart size.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run_benchmark(options)
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, options):
+        user = User.objects.create(
+            username='benchmark', email='benchmark@foodgram.local',
+            first_name='Benchmark', last_name='User')
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'benchmark ingredient {number}',
+                measurement_unit='g'
+            )
+            for number in range(options['ingredients'] * 2)
+        )
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+
+        self.stdout.write(
+            f'{"recipes":>8} {"queries":>8} {"ttfb ms":>8} {"total ms":>9} '
+            f'{"peak KiB":>9} {"canvas ms":>10} {"canvas KiB":>11} '
+            f'{"bytes":>8}'
+        )
+        cart_size = 0
+        for size in sorted(options['sizes']):
+            self.fill_cart(user, ingredients, cart_size, size, options)
+            cart_size = size
+            with CaptureQueriesContext(connection) as queries:
+                b''.join(download(client))
+            query_count = len(queries)
+
+            first_byte_timings, timings = [], []
+            for _ in range(options['repeat']):
+                start = perf_counter()
+                chunks = iter(download(client))
+                content = next(chunks)
+                first_byte_timings.append((perf_counter() - start) * 1000)
+                content += b''.join(chunks)
+                timings.append((perf_counter() - start) * 1000)
+            peak_memory = measure_peak_memory(
+                lambda: b''.join(download(client)))
+
+            shopping_list = get_shopping_list(user)
+            canvas_timings = []
+            for _ in range(options['repeat']):
+                start = perf_counter()
+                render_with_canvas(shopping_list)
+                canvas_timings.append((perf_counter() - start) * 1000)
+            canvas_peak_memory = measure_peak_memory(
+                lambda: render_with_canvas(shopping_list))
+
+            self.stdout.write(
+                f'{size:>8} {query_count:>8} '
+                f'{median(first_byte_timings):>8.1f} '
+                f'{median(timings):>9.1f} {peak_memory:>9} '
+                f'{median(canvas_timings):>10.1f} {canvas_peak_memory:>11} '
+                f'{len(content):>8}'
+            )
+
+    def fill_cart(self, user, ingredients, start, stop, options):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=user,
+                name=f'Benchmark recipe {number}',
+                image='recipes/benchmark.png',
+                text='Benchmark recipe',
+                cooking_time=10,
+            )
+            for number in range(start, stop)
+        )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient=ingredients[
+                    (number + offset) % len(ingredients)],
+                amount=offset + 1,
+            )
+            for number, recipe in enumerate(recipes, start)
+            for offset in range(options['ingredients'])
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes)
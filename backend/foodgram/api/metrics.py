@@ -0,0 +1,370 @@
+import json
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import monotonic, perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+
+from .recipe_cache import recipe_cache
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+PARTS = ('total', 'db', 'serialize', 'render')
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Time spent on the parts of a sampled request.
+
+    The parts do not overlap: the queries run while serializing or
+    rendering count towards db only.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.route = None
+        self.queries = 0
+        self.durations = dict.fromkeys(PARTS, 0.0)
+        self.measuring = False
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting the queries and their time."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['db'] += perf_counter() - started
+            self.queries += 1
+
+    def finish(self):
+        self.durations['total'] = perf_counter() - self.started
+
+    def header(self):
+        """Returns the value of the Server-Timing header."""
+        return ', '.join(
+            f'{part};dur={duration * 1000:.1f}'
+            + (f';desc="{self.queries} queries"' if part == 'db' else '')
+            for part, duration in self.durations.items()
+        )
+
+
+@contextmanager
+def measure(part):
+    """Adds the time spent in the block to the part of the current request.
+
+    Nested blocks are counted once, by the outermost one, so serializers
+    nested in other serializers are not counted twice.
+    """
+    timings = current_timings.get()
+    if timings is None or timings.measuring:
+        yield
+        return
+    timings.measuring = True
+    started = perf_counter()
+    db_started = timings.durations['db']
+    try:
+        yield
+    finally:
+        timings.measuring = False
+        timings.durations[part] += (
+            perf_counter() - started
+            - (timings.durations['db'] - db_started)
+        )
+
+
+class TimedSerializerMixin:
+    """Mixin that counts the serializer time of sampled requests."""
+
+    def to_representation(self, instance):
+        with measure('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedRendererMixin:
+    """Mixin that counts the render time of sampled requests."""
+
+    def render(self, *args, **kwargs):
+        with measure('render'):
+            return super().render(*args, **kwargs)
+
+
+class Histogram:
+    """Histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Returns the cumulative counts by upper bound, as Prometheus does."""
+        total = 0
+        counts = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            counts.append((str(bound), total))
+        return counts
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(self.cumulative()),
+        }
+
+
+class RouteMetrics:
+    """Histograms of the sampled requests of this process by route.
+
+    Routes are DRF views and actions, such as RecipeViewSet.list, so
+    their number is bounded by the URL configuration.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = Lock()
+
+    def observe(self, route, timings):
+        with self.lock:
+            histograms = self.routes.get(route)
+            if histograms is None:
+                histograms = self.routes[route] = {
+                    part: Histogram(DURATION_BUCKETS) for part in PARTS}
+                histograms['queries'] = Histogram(QUERY_BUCKETS)
+            for part, duration in timings.durations.items():
+                histograms[part].observe(duration)
+            histograms['queries'].observe(timings.queries)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                route: {
+                    name: histogram.as_dict()
+                    for name, histogram in histograms.items()
+                }
+                for route, histograms in sorted(self.routes.items())
+            }
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+def routes_prometheus(routes):
+    """Returns the route histograms in the Prometheus text format."""
+    durations = [
+        '# HELP foodgram_request_duration_seconds Time spent on the '
+        'parts of the sampled requests.',
+        '# TYPE foodgram_request_duration_seconds histogram',
+    ]
+    queries = [
+        '# HELP foodgram_request_queries SQL queries of the sampled '
+        'requests.',
+        '# TYPE foodgram_request_queries histogram',
+    ]
+    for route, histograms in routes.items():
+        for name, histogram in histograms.items():
+            if name == 'queries':
+                lines = queries
+                metric = 'foodgram_request_queries'
+                labels = f'route="{route}"'
+            else:
+                lines = durations
+                metric = 'foodgram_request_duration_seconds'
+                labels = f'route="{route}",part="{name}"'
+            lines.extend(
+                f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+                for bound, count in histogram['buckets'].items()
+            )
+            lines.append(f'{metric}_sum{{{labels}}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{{labels}}} {histogram["count"]}')
+    return '\n'.join(durations + queries) + '\n'
+
+
+def caches_prometheus(caches):
+    """Returns the statistics of the response caches in the Prometheus format.
+
+    caches maps the names of the caches to their stats().
+    """
+    metrics = [
+        ('hits', 'counter', 'Responses served from the cache.'),
+        ('misses', 'counter', 'Cacheable responses not found in the cache.'),
+        ('hit_ratio', 'gauge', 'Share of the lookups served from the cache.'),
+        ('entries', 'gauge', 'Responses kept in the cache.'),
+        ('size', 'gauge', 'Size of the responses kept in the cache in bytes.'),
+    ]
+    lines = []
+    for name, metric_type, description in metrics:
+        metric = f'foodgram_response_cache_{name}'
+        if metric_type == 'counter':
+            metric += '_total'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        lines.extend(
+            f'{metric}{{cache="{cache}"}} {stats[name]}'
+            for cache, stats in sorted(caches.items())
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsStore:
+    """Metrics snapshots of all the worker processes, one file each.
+
+    Every process rewrites its own file in directory at most once every
+    interval seconds, when it handles a sampled request, and the metrics
+    views add up the files of the running processes, so a scrape covers
+    the whole server whichever worker answers it. Files of exited
+    processes are deleted when the metrics are read, which Prometheus
+    sees as a counter reset. Without a directory only this process is
+    reported.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = Path(directory) if directory else None
+        self.interval = interval
+        self.pid = None
+        self.path = None
+        self.saved = None
+        self.lock = Lock()
+
+    def get_path(self):
+        # Worker processes forked from the same parent get their own file.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.path = self.directory / f'{self.pid}-{uuid4().hex}.json'
+            self.saved = None
+            # Files with the pid of this process were left by an exited
+            # one, for instance before the container restarted.
+            for path in self.directory.glob(f'{self.pid}-*.json'):
+                path.unlink(missing_ok=True)
+        return self.path
+
+    def save(self, get_snapshot):
+        """Saves the snapshot if the last one is older than interval."""
+        if self.directory is None or not self.lock.acquire(blocking=False):
+            return
+        try:
+            if (self.saved is not None and self.pid == os.getpid()
+                    and monotonic() - self.saved < self.interval):
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.get_path()
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(get_snapshot()))
+            os.replace(temporary, path)
+            self.saved = monotonic()
+        except OSError:
+            pass
+        finally:
+            self.lock.release()
+
+    def load(self, snapshot):
+        """Returns the snapshot of this process and the saved ones of the
+        other running processes, deleting the files of exited ones."""
+        snapshots = [snapshot]
+        if self.directory is None or not self.directory.is_dir():
+            return snapshots
+        own_path = self.get_path()
+        for path in self.directory.glob('*.json'):
+            if path == own_path:
+                continue
+            pid = path.name.split('-')[0]
+            if not pid.isdigit() or not is_running(int(pid)):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def is_running(pid):
+    """Returns whether a process with the pid is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_routes(snapshots):
+    """Adds up the route histograms of several processes."""
+    routes = {}
+    for snapshot in snapshots:
+        for route, histograms in snapshot['routes'].items():
+            merged = routes.setdefault(route, {})
+            for name, histogram in histograms.items():
+                total = merged.setdefault(
+                    name, {'count': 0, 'sum': 0, 'buckets': {}})
+                total['count'] += histogram['count']
+                total['sum'] += histogram['sum']
+                for bound, count in histogram['buckets'].items():
+                    total['buckets'][bound] = (
+                        total['buckets'].get(bound, 0) + count)
+    return dict(sorted(routes.items()))
+
+
+def merge_caches(snapshots):
+    """Adds up the response cache statistics of several running processes.
+
+    The entries and size gauges are only meaningful for the processes
+    that are still running, so the snapshots of exited ones must already
+    be left out.
+    """
+    caches = {}
+    for snapshot in snapshots:
+        for cache, stats in snapshot['caches'].items():
+            total = caches.setdefault(
+                cache, dict.fromkeys(('hits', 'misses', 'entries', 'size'), 0))
+            for name in total:
+                total[name] += stats[name]
+    for stats in caches.values():
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0
+    return caches
+
+
+route_metrics = RouteMetrics()
+metrics_store = MetricsStore(
+    settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+
+def get_process_metrics():
+    """Returns the route histograms and cache statistics of this process."""
+    return {
+        'routes': route_metrics.snapshot(),
+        'caches': {'recipes': recipe_cache.stats()},
+    }
+
+
+def save_metrics():
+    """Saves the metrics of this process for the other processes, at most
+    once every METRICS_FLUSH_INTERVAL seconds."""
+    metrics_store.save(get_process_metrics)
+
+
+def collect_metrics():
+    """Returns the metrics of all the worker processes added up."""
+    snapshots = metrics_store.load(get_process_metrics())
+    return {
+        'processes': len(snapshots),
+        'routes': merge_routes(snapshots),
+        'caches': merge_caches(snapshots),
+    }
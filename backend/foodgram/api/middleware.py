@@ -0,0 +1,96 @@
+from random import random
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_encoding, compress, is_compressible
+from .metrics import (RequestTimings, current_timings, route_metrics,
+                      save_metrics)
+
+
+def get_route(request, view_func):
+    """Returns the name of the DRF view and action handling the request."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class ServerTimingMiddleware:
+    """Measures a sample of the requests.
+
+    Sampled responses get a Server-Timing header with the SQL query count
+    and time, the serializer time, the render time and the total time,
+    which are also added to the histograms of the route. The histograms
+    are saved for the metrics views of the other worker processes every
+    METRICS_FLUSH_INTERVAL seconds at most. Only
+    METRICS_SAMPLE_RATE of the requests are measured, the others only
+    cost a random number.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        timings.finish()
+        response['Server-Timing'] = timings.header()
+        if timings.route is not None:
+            route_metrics.observe(timings.route, timings)
+            save_metrics()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.route = get_route(request, view_func)
+
+
+class CompressionMiddleware:
+    """Compresses the API responses with brotli or gzip.
+
+    Only /api/ responses of a compressible type and of at least
+    COMPRESSION_MIN_SIZE bytes are compressed, with the coding preferred
+    by Accept-Encoding. Streaming responses, such as the shopping list
+    download, and responses that are already encoded, such as the
+    pre-compressed reference lists, are sent as they are.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (not request.path.startswith('/api/')
+                or response.streaming
+                or response.has_header('Content-Encoding')
+                or not is_compressible(response)
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        content = compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The compressed body is no longer byte-identical to the original.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
@@ -1,7 +1,84 @@
-from rest_framework.pagination import PageNumberPagination
+from time import monotonic
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from .cache import LRUCache
+
+count_cache = LRUCache(
+    settings.PAGINATION_COUNT_CACHE_SIZE, sizeof=lambda item: 1)
+
+
+def is_cursor_requested(request):
+    """Tells if the client opted in to cursor pagination."""
+    return (
+        'cursor' in request.query_params
+        or request.query_params.get('pagination') == 'cursor'
+    )
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator reusing the object counts of recent identical queries."""
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        try:
+            key = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = (key[0], tuple(map(str, key[1])))
+        cached = count_cache.get(key)
+        if (cached is not None and monotonic() - cached[1]
+                < settings.PAGINATION_COUNT_CACHE_TIMEOUT):
+            return cached[0]
+        count = super().count
+        count_cache.set(key, (count, monotonic()))
+        return count
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     """Custom pagination class having page_size_query_param."""
 
     page_size_query_param = 'limit'
+    django_paginator_class = CachedCountPaginator
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Cursor pagination class for recipes, newest first."""
+
+    page_size_query_param = 'limit'
+    ordering = ['-pub_date', '-id']
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    """Cursor pagination class for subscriptions."""
+
+    page_size_query_param = 'limit'
+    ordering = ['-pk']
+
+
+class OptionalCursorPaginationMixin:
+    """Lets clients opt in to cursor pagination with ?pagination=cursor.
+
+    The cursor pagination classes are looked up by view action, the other
+    actions and requests use the regular pagination class.
+    """
+
+    cursor_pagination_classes = {}
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            cursor_pagination_class = self.cursor_pagination_classes.get(
+                self.action)
+            if cursor_pagination_class and is_cursor_requested(self.request):
+                self._paginator = cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
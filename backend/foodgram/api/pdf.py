@@ -0,0 +1,232 @@
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import registerFont
+from reportlab.pdfbase.ttfonts import (FF_NONSYMBOLIC, FF_SYMBOLIC, TTFont,
+                                       makeToUnicodeCMap)
+
+FONT_NAME = 'FreeSans'
+FONT_PATH = Path(settings.BASE_DIR, 'FreeSans.ttf')
+MISSING_CHARACTER = '?'
+# Code 0 of every single-byte subset is the missing glyph.
+SUBSET_SIZE = 255
+DOCUMENT_FONTS_CACHE_SIZE = 64
+
+CATALOG_NUMBER = 1
+PAGES_NUMBER = 2
+FONT_NUMBER = 3
+FONT_OBJECTS = 4
+
+
+class FontSubset:
+    """Single-byte subset of the TTF font with up to SUBSET_SIZE characters.
+
+    The subset is embedded as the font resource_name made of the four
+    objects starting from number.
+    """
+
+    def __init__(self, face, characters, resource_name, number):
+        self.characters = [0] + [ord(char) for char in characters]
+        self.codes = {char: code for code, char in enumerate(characters, 1)}
+        self.resource_name = resource_name
+        self.number = number
+        self.objects = self.make_objects(face)
+
+    def make_objects(self, face):
+        base_font = (
+            b'%s+' % subset_tag(self.number).encode()
+            + face.name + face.subfontNameX
+        )
+        widths = ' '.join(
+            str(face.getCharWidth(character))
+            for character in self.characters
+        )
+        font = (
+            b'<< /Type /Font /Subtype /TrueType /BaseFont /' + base_font
+            + b' /FirstChar 0 /LastChar %d /Widths [' % (
+                len(self.characters) - 1)
+            + widths.encode() + b'] /FontDescriptor %d 0 R'
+            b' /ToUnicode %d 0 R >>' % (self.number + 1, self.number + 3)
+        )
+        flags = face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC
+        descriptor = (
+            b'<< /Type /FontDescriptor /FontName /' + base_font
+            + b' /Flags %d /FontBBox [%s] /ItalicAngle %s /Ascent %d'
+            b' /Descent %d /CapHeight %d /StemV %d /MissingWidth %d'
+            b' /FontFile2 %d 0 R >>' % (
+                flags, ' '.join(map(str, face.bbox)).encode(),
+                str(face.italicAngle).encode(), face.ascent, face.descent,
+                face.capHeight, face.stemV, face.defaultWidth,
+                self.number + 2
+            )
+        )
+        font_file = face.makeSubset(self.characters)
+        to_unicode = makeToUnicodeCMap(
+            base_font.decode(), self.characters).encode()
+        return [
+            (self.number, font),
+            (self.number + 1, descriptor),
+            (self.number + 2, make_stream(
+                font_file, b'/Length1 %d' % len(font_file))),
+            (self.number + 3, make_stream(to_unicode)),
+        ]
+
+
+class DocumentFont:
+    """Subsets of the TTF font with the characters a document uses.
+
+    Documents using more than SUBSET_SIZE characters get several subsets.
+    Characters the font has no glyph for are printed as MISSING_CHARACTER.
+    """
+
+    def __init__(self, font, characters):
+        self.glyphs = font.face.charToGlyph
+        used = sorted({self.substitute(char) for char in characters})
+        self.subsets = [
+            FontSubset(
+                font.face, used[start:start + SUBSET_SIZE],
+                f'F{index + 1}', FONT_NUMBER + FONT_OBJECTS * index
+            )
+            for index, start in enumerate(range(0, len(used), SUBSET_SIZE))
+        ]
+        self.subset_codes = {
+            char: (subset, code)
+            for subset in self.subsets
+            for char, code in subset.codes.items()
+        }
+        self.objects = [
+            item for subset in self.subsets for item in subset.objects]
+        self.resources = b' '.join(
+            b'/%s %d 0 R' % (subset.resource_name.encode(), subset.number)
+            for subset in self.subsets
+        )
+
+    def substitute(self, char):
+        if char == '\xa0':
+            return ' '
+        if ord(char) in self.glyphs:
+            return char
+        return MISSING_CHARACTER
+
+    def encode(self, text, font_size):
+        """Returns the operators showing the text, subset by subset."""
+        runs = []
+        for char in text:
+            subset, code = self.subset_codes[self.substitute(char)]
+            if not runs or runs[-1][0] is not subset:
+                runs.append((subset, []))
+            runs[-1][1].append(code)
+        return b' '.join(
+            b'/%s %d Tf <%s> Tj' % (
+                subset.resource_name.encode(), font_size,
+                bytes(codes).hex().upper().encode()
+            )
+            for subset, codes in runs
+        )
+
+
+def subset_tag(number):
+    """Returns the six capital letters tagging the subset font name."""
+    return ''.join(
+        chr(ord('A') + number // 26 ** position % 26)
+        for position in range(5, -1, -1)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_font():
+    """Registers the document font once per process and returns it."""
+    font = TTFont(FONT_NAME, FONT_PATH)
+    registerFont(font)
+    return font
+
+
+@lru_cache(maxsize=DOCUMENT_FONTS_CACHE_SIZE)
+def get_document_font(characters):
+    """Returns the font subsets for a frozenset of characters."""
+    return DocumentFont(get_font(), characters)
+
+
+def make_stream(content, extra_entries=b''):
+    compressed = zlib.compress(content)
+    return (
+        b'<< /Length %d /Filter /FlateDecode %s>>\nstream\n' % (
+            len(compressed), extra_entries + b' ' if extra_entries else b'')
+        + compressed + b'\nendstream'
+    )
+
+
+def render_pages(pages, page_size=A4):
+    """Yields a PDF document chunk by chunk, one chunk per page.
+
+    Every page is a list of (font_size, x, y, text) lines. The font and
+    the page tree are written first, so each page is sent to the client
+    as soon as it is rendered and only the object offsets are kept until
+    the cross-reference table at the end.
+    """
+    document_font = get_document_font(frozenset(
+        char for lines in pages for *_, text in lines for char in text))
+    first_page_number = (
+        FONT_NUMBER + FONT_OBJECTS * len(document_font.subsets))
+    page_numbers = [
+        first_page_number + 2 * index + 1 for index in range(len(pages))]
+    offsets = {}
+    position = 0
+
+    def write(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+
+    chunk = b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n'
+    position = len(chunk)
+    chunk += write(
+        CATALOG_NUMBER,
+        b'<< /Type /Catalog /Pages %d 0 R >>' % PAGES_NUMBER
+    )
+    chunk += write(
+        PAGES_NUMBER,
+        b'<< /Type /Pages /Count %d /Kids [%s] >>' % (
+            len(pages),
+            b' '.join(b'%d 0 R' % number for number in page_numbers)
+        )
+    )
+    for number, body in document_font.objects:
+        chunk += write(number, body)
+    yield chunk
+
+    media_box = b'[0 0 %s %s]' % (
+        str(page_size[0]).encode(), str(page_size[1]).encode())
+    for page_number, lines in zip(page_numbers, pages):
+        content = b'\n'.join(
+            b'BT %d %d Td %s ET' % (
+                x, y, document_font.encode(text, font_size))
+            for font_size, x, y, text in lines
+        )
+        chunk = write(page_number - 1, make_stream(content))
+        chunk += write(page_number, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox %s'
+            b' /Resources << /Font << %s >> >>'
+            b' /Contents %d 0 R >>' % (
+                PAGES_NUMBER, media_box, document_font.resources,
+                page_number - 1
+            )
+        ))
+        yield chunk
+
+    size = max(offsets) + 1
+    xref = [b'xref\n0 %d\n0000000000 65535 f \n' % size]
+    xref.extend(
+        b'%010d 00000 n \n' % offsets[number] if number in offsets
+        else b'0000000000 65535 f \n'
+        for number in range(1, size)
+    )
+    yield b''.join(xref) + (
+        b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            size, CATALOG_NUMBER, position)
+    )
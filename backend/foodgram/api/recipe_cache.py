@@ -0,0 +1,128 @@
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import LRUCache
+
+
+class RecipeResponseCache:
+    """In-process cache of the rendered recipe responses for anonymous users.
+
+    Every entry belongs to invalidation groups: a list page to the author
+    or the tags it is filtered by, or to 'all' when it is not filtered,
+    and a recipe detail to that recipe. Both also belong to the authors
+    of the recipes they display. Purging a group bumps its generation,
+    which makes all the entries stored under older generations stale.
+    When more than max_groups generations are kept, they are dropped,
+    which makes all the entries stale. Entries also expire after timeout
+    seconds, which bounds the staleness caused by changes made in other
+    processes.
+    """
+
+    def __init__(self, max_size, timeout, max_groups):
+        self.timeout = timeout
+        self.max_groups = max_groups
+        self.responses = LRUCache(
+            max_size, sizeof=lambda entry: len(entry['content']))
+        self.generations = {}
+        # Bumped when the generations are dropped, to keep older entries
+        # from matching the restarted generations.
+        self.epoch = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def list_entry(self, query_params):
+        """Returns the key and the groups of a recipe list page."""
+        params = sorted(
+            (name, value)
+            for name in query_params
+            for value in set(query_params.getlist(name))
+        )
+        author = query_params.get('author', '')
+        if author.isdigit():
+            author = int(author)
+        tags = set(query_params.getlist('tags'))
+        if author:
+            groups = [f'author:{author}']
+        elif tags:
+            groups = [f'tag:{slug}' for slug in sorted(tags)]
+        else:
+            groups = ['all']
+        return f'list:{urlencode(params)}', groups
+
+    def detail_entry(self, pk):
+        """Returns the key and the groups of a recipe detail."""
+        return f'detail:{pk}', [f'recipe:{pk}']
+
+    def author_groups(self, data):
+        """Returns the groups of the authors of the recipes in a response."""
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+        return [f'author:{recipe["author"]["id"]}' for recipe in data]
+
+    def get(self, key):
+        entry = self.responses.get(key)
+        if (entry is None
+                or monotonic() - entry['created'] > self.timeout
+                or entry['generations'] != self.get_generations(
+                    entry['groups'])):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['content']
+
+    def set(self, key, groups, content):
+        groups = sorted(set(groups))
+        self.responses.set(key, {
+            'created': monotonic(),
+            'groups': groups,
+            'generations': self.get_generations(groups),
+            'content': content,
+        })
+
+    def get_generations(self, groups):
+        with self.lock:
+            return self.epoch, [
+                self.generations.get(group, 0) for group in groups]
+
+    def purge(self, groups):
+        with self.lock:
+            for group in groups:
+                self.generations[group] = self.generations.get(group, 0) + 1
+            if len(self.generations) > self.max_groups:
+                self.generations.clear()
+                self.epoch += 1
+
+    def clear(self):
+        self.responses.clear()
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0,
+            'entries': len(self.responses.items),
+            'size': self.responses.size,
+        }
+
+
+recipe_cache = RecipeResponseCache(
+    settings.RECIPE_CACHE_SIZE,
+    settings.RECIPE_CACHE_TIMEOUT,
+    settings.RECIPE_CACHE_MAX_GROUPS,
+)
+
+
+def purge_recipe_responses(groups):
+    """Purges the cached responses now and once the transaction commits.
+
+    The second purge drops the responses rendered from the old data by
+    concurrent requests before the changes became visible to them.
+    """
+    recipe_cache.purge(groups)
+    transaction.on_commit(lambda: recipe_cache.purge(groups))
@@ -0,0 +1,109 @@
+import hashlib
+from threading import Lock
+from time import monotonic, time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+from recipes.models import Ingredient, Tag
+from rest_framework.renderers import JSONRenderer
+
+from .compression import ENCODINGS, choose_encoding, compress
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class ReferencePayload:
+    """Rendered list of a rarely changing model kept by every process.
+
+    The JSON body, its copies compressed with every content coding and
+    their ETags are built on first use and rebuilt after invalidation or
+    once they are older than max_age seconds, which picks up changes made
+    by other processes. Bodies under COMPRESSION_MIN_SIZE bytes are only
+    sent uncompressed.
+    """
+
+    def __init__(self, queryset, serializer_class, max_age):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.max_age = max_age
+        self.lock = Lock()
+        self.data = None
+
+    def invalidate(self):
+        self.data = None
+
+    def is_fresh(self, data):
+        return (
+            data is not None
+            and monotonic() - data['built_at'] <= self.max_age
+        )
+
+    def get_data(self):
+        data = self.data
+        if self.is_fresh(data):
+            return data
+        with self.lock:
+            data = self.data
+            if not self.is_fresh(data):
+                data = self.build(data)
+                self.data = data
+        return data
+
+    def build(self, previous):
+        built_at = monotonic()
+        body = JSONRenderer().render(
+            self.serializer_class(self.queryset.all(), many=True).data)
+        digest = hashlib.sha1(body).hexdigest()
+        last_modified = int(time())
+        if previous and previous['digest'] == digest:
+            last_modified = previous['last_modified']
+        encoded = {}
+        if len(body) >= settings.COMPRESSION_MIN_SIZE:
+            encoded = {
+                encoding: compress(body, encoding, best=True)
+                for encoding in ENCODINGS
+            }
+        return {
+            'built_at': built_at,
+            'digest': digest,
+            'last_modified': last_modified,
+            'body': body,
+            'encoded': encoded,
+        }
+
+    def get_response(self, request):
+        """Returns the payload or 304 Not Modified for the request."""
+        data = self.get_data()
+        encoding = None
+        if data['encoded']:
+            encoding = choose_encoding(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            etag = f'"{data["digest"]}"'
+        else:
+            etag = f'"{data["digest"]}-{encoding}"'
+        response = get_conditional_response(
+            request, etag=etag, last_modified=data['last_modified'])
+        if response is None:
+            if encoding is None:
+                response = HttpResponse(
+                    data['body'], content_type='application/json')
+            else:
+                response = HttpResponse(
+                    data['encoded'][encoding],
+                    content_type='application/json')
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(data['last_modified'])
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+tags_payload = ReferencePayload(
+    Tag.objects.all(), TagSerializer, settings.REFERENCE_DATA_MAX_AGE)
+ingredients_payload = ReferencePayload(
+    Ingredient.objects.all(), IngredientSerializer,
+    settings.REFERENCE_DATA_MAX_AGE)
@@ -0,0 +1,115 @@
+from django.db import connection, transaction
+from django.db.models import F
+from recipes.models import Favorite, ShoppingCart
+from recipes.signals import bump_shopping_cart_versions
+from users.models import Subscription, User
+
+from .pagination import count_cache
+
+
+class UserRelation:
+    """Set-based writes of the rows linking a user to recipes or authors.
+
+    Rows are added with a single INSERT ... ON CONFLICT DO NOTHING
+    RETURNING and removed with a single DELETE ... RETURNING, so the
+    unique constraint tells which rows already existed, concurrent
+    requests never fail on it and only the rows really written are
+    counted. These statements bypass the model signals, so the counters
+    and caches maintained by the signals are updated here.
+    """
+
+    def __init__(self, model, target_field, counter_field):
+        self.model = model
+        self.target_field = model._meta.get_field(target_field)
+        self.target_model = self.target_field.related_model
+        self.user_field = model._meta.get_field('user')
+        self.counter_field = counter_field
+
+    def get_targets(self, user, target_ids):
+        return self.target_model.objects.filter(
+            pk__in=target_ids).order_by()
+
+    def add(self, user, target_ids):
+        """Links the user to the existing targets and returns their ids."""
+        if not target_ids:
+            return set()
+        quote_name = connection.ops.quote_name
+        targets_sql, params = self.get_targets(
+            user, target_ids).values('pk').query.sql_with_params()
+        target_column = quote_name(self.target_field.column)
+        target_pk = quote_name(self.target_model._meta.pk.column)
+        # The WHERE clause keeps SQLite from parsing ON CONFLICT as a join.
+        sql = (
+            f'INSERT INTO {quote_name(self.model._meta.db_table)} '
+            f'({quote_name(self.user_field.column)}, {target_column}) '
+            f'SELECT %s, "targets".{target_pk} '
+            f'FROM ({targets_sql}) AS "targets" WHERE TRUE '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}'
+        )
+        with transaction.atomic():
+            added = self.execute(sql, (user.pk, *params))
+            self.changed(user, added, 1)
+        return added
+
+    def remove(self, user, target_ids=None):
+        """Unlinks the user from the targets, or from all of them if None.
+
+        Returns the ids of the targets that were linked.
+        """
+        if target_ids is not None and not target_ids:
+            return set()
+        quote_name = connection.ops.quote_name
+        target_column = quote_name(self.target_field.column)
+        sql = (
+            f'DELETE FROM {quote_name(self.model._meta.db_table)} '
+            f'WHERE {quote_name(self.user_field.column)} = %s'
+        )
+        params = [user.pk]
+        if target_ids is not None:
+            sql += (
+                f' AND {target_column} IN '
+                f'({", ".join(["%s"] * len(target_ids))})'
+            )
+            params.extend(target_ids)
+        sql += f' RETURNING {target_column}'
+        with transaction.atomic():
+            removed = self.execute(sql, params)
+            self.changed(user, removed, -1)
+        return removed
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {target_id for target_id, in cursor.fetchall()}
+
+    def changed(self, user, target_ids, delta):
+        """Counts the added or removed rows, as the model signals do."""
+        if not target_ids:
+            return
+        field = self.counter_field
+        targets = self.target_model.objects.filter(pk__in=target_ids)
+        if delta < 0:
+            targets = targets.filter(**{f'{field}__gt': 0})
+        targets.update(**{field: F(field) + delta})
+        count_cache.clear()
+
+
+class ShoppingCartRelation(UserRelation):
+    """Shopping cart writes, which also change the user's shopping list."""
+
+    def changed(self, user, target_ids, delta):
+        super().changed(user, target_ids, delta)
+        if target_ids:
+            bump_shopping_cart_versions(User.objects.filter(pk=user.pk))
+
+
+class SubscriptionRelation(UserRelation):
+    """Subscription writes, which skip subscribing users to themselves."""
+
+    def get_targets(self, user, target_ids):
+        return super().get_targets(user, target_ids).exclude(pk=user.pk)
+
+
+favorites = UserRelation(Favorite, 'recipe', 'favorites_count')
+shopping_cart = ShoppingCartRelation(ShoppingCart, 'recipe', 'in_carts_count')
+subscriptions = SubscriptionRelation(Subscription, 'author', 'followers_count')
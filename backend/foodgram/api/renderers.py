@@ -0,0 +1,42 @@
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import TimedRendererMixin, measure
+
+
+class JSONRenderer(TimedRendererMixin, renderers.JSONRenderer):
+    """JSON renderer counting its time in the request metrics."""
+
+
+class BrowsableAPIRenderer(
+    TimedRendererMixin, renderers.BrowsableAPIRenderer
+):
+    """Browsable API renderer counting its time in the request metrics."""
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer encoding with orjson.
+
+    Types orjson does not know, such as lazy translations, are encoded
+    the way DRF does, and non-string keys, such as the list indexes of
+    validation errors, are turned into strings like the json module does.
+    Indented output, as requested by the browsable API, is left to the
+    standard renderer.
+    """
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        with measure('render'):
+            return orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=orjson.OPT_NON_STR_KEYS
+            )
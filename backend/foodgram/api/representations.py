@@ -0,0 +1,125 @@
+from collections import defaultdict
+
+from recipes.models import Recipe, RecipeIngredients
+
+from .fields import get_image_url
+from .metrics import measure
+from .serializers import get_followed_author_ids
+
+USER_VALUES = ('email', 'id', 'username', 'first_name', 'last_name')
+RECIPE_VALUES = (
+    'id', 'pub_date', 'name', 'image', 'thumbnails', 'text', 'cooking_time',
+    'favorited', 'in_shopping_cart', 'author_id', 'author__email',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+LIGHT_RECIPE_VALUES = (
+    'id', 'author_id', 'name', 'image', 'thumbnails', 'cooking_time')
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def is_subscribed(request, user_id):
+    """Tells if the requesting user follows the user, as the serializer."""
+    if (request is None or request.user.is_anonymous
+            or user_id == request.user.pk):
+        return False
+    return user_id in get_followed_author_ids(request)
+
+
+def represent_users(rows, request):
+    """Returns the users in .values(*USER_VALUES) rows as the serializer."""
+    with measure('serialize'):
+        return [
+            {**row, 'is_subscribed': is_subscribed(request, row['id'])}
+            for row in rows
+        ]
+
+
+def represent_recipes(rows, request, thumbnail_size):
+    """Returns the recipes in .values(*RECIPE_VALUES) rows as the serializer.
+
+    The tags and the ingredients of all the recipes are loaded with a
+    query each. Images are thumbnails of thumbnail_size, or the full
+    images when it is None.
+    """
+    with measure('serialize'):
+        ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for tag in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag_id').values(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            tags[tag['recipe_id']].append({
+                'id': tag['tag_id'],
+                'name': tag['tag__name'],
+                'color': tag['tag__color'],
+                'slug': tag['tag__slug'],
+            })
+        ingredients = defaultdict(list)
+        for ingredient in RecipeIngredients.objects.filter(
+            recipe_id__in=ids
+        ).order_by('pk').values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[ingredient['recipe_id']].append({
+                'id': ingredient['ingredient_id'],
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['amount'],
+            })
+        return [
+            {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': {
+                    'email': row['author__email'],
+                    'id': row['author_id'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'is_subscribed': is_subscribed(
+                        request, row['author_id']),
+                },
+                'ingredients': ingredients[row['id']],
+                'is_favorited': bool(row['favorited']),
+                'is_in_shopping_cart': bool(row['in_shopping_cart']),
+                'name': row['name'],
+                'image': get_image_url(
+                    image_storage, row['image'], row['thumbnails'],
+                    thumbnail_size, request),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+            for row in rows
+        ]
+
+
+def represent_subscriptions(rows, recipes):
+    """Returns the followed authors as the subscription serializer.
+
+    The rows are .values(*USER_VALUES, 'recipes_count') of the authors
+    and recipes are .values(*LIGHT_RECIPE_VALUES) of their recipes. Like
+    the serializer, recipe image URLs are relative small thumbnails.
+    """
+    recipes_by_author = defaultdict(list)
+    with measure('serialize'):
+        for recipe in recipes:
+            recipes_by_author[recipe['author_id']].append({
+                'id': recipe['id'],
+                'name': recipe['name'],
+                'image': get_image_url(
+                    image_storage, recipe['image'], recipe['thumbnails'],
+                    'small', None),
+                'cooking_time': recipe['cooking_time'],
+            })
+        return [
+            {
+                **{name: row[name] for name in USER_VALUES},
+                'is_subscribed': True,
+                'recipes': recipes_by_author[row['id']],
+                'recipes_count': row['recipes_count'],
+            }
+            for row in rows
+        ]
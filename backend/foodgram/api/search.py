@@ -0,0 +1,117 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from recipes.models import Ingredient
+
+MAX_GRAM_LENGTH = 3
+
+
+class IngredientIndex:
+    """In-process search index over ingredient names.
+
+    Prefix matches are found by bisecting the sorted list of lowercased
+    names, substring matches through the postings of all the name n-grams
+    up to MAX_GRAM_LENGTH characters long. The index is built on first use
+    and rebuilt after invalidation or once it is older than max_age
+    seconds, which picks up changes made by other processes.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.lock = Lock()
+        self.data = None
+
+    def invalidate(self):
+        self.data = None
+
+    def is_fresh(self, data):
+        return (
+            data is not None
+            and monotonic() - data['built_at'] <= self.max_age
+        )
+
+    def get_data(self):
+        data = self.data
+        if self.is_fresh(data):
+            return data
+        with self.lock:
+            data = self.data
+            if not self.is_fresh(data):
+                data = self.build()
+                self.data = data
+        return data
+
+    def build(self):
+        built_at = monotonic()
+        entries = list(Ingredient.objects.order_by('pk').values(
+            'id', 'name', 'measurement_unit'))
+        names = [entry['name'].lower() for entry in entries]
+        postings = {}
+        for position, name in enumerate(names):
+            grams = {
+                name[start:start + length]
+                for length in range(1, MAX_GRAM_LENGTH + 1)
+                for start in range(len(name) - length + 1)
+            }
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        return {
+            'built_at': built_at,
+            'entries': entries,
+            'names': names,
+            'sorted_names': sorted(
+                (name, position) for position, name in enumerate(names)),
+            'postings': postings,
+        }
+
+    def search(self, value):
+        """Returns the ingredients whose names contain the value.
+
+        The names starting with the value go first, the rest follow,
+        both in primary key order like the database ordering.
+        """
+        data = self.get_data()
+        value = value.lower()
+        sorted_names = data['sorted_names']
+        prefix_matches = []
+        start = bisect_left(sorted_names, (value,))
+        for name, position in sorted_names[start:]:
+            if not name.startswith(value):
+                break
+            prefix_matches.append(position)
+        prefix_matches.sort()
+        if len(value) <= MAX_GRAM_LENGTH:
+            matches = data['postings'].get(value, [])
+        else:
+            matches = self.find_substring(data, value)
+        prefix_positions = set(prefix_matches)
+        positions = prefix_matches + [
+            position for position in matches
+            if position not in prefix_positions
+        ]
+        entries = data['entries']
+        return [entries[position] for position in positions]
+
+    def find_substring(self, data, value):
+        postings = data['postings']
+        grams = {
+            value[start:start + MAX_GRAM_LENGTH]
+            for start in range(len(value) - MAX_GRAM_LENGTH + 1)
+        }
+        candidates = sorted(
+            (postings.get(gram, []) for gram in grams), key=len)
+        positions = set(candidates[0])
+        for posting in candidates[1:]:
+            positions.intersection_update(posting)
+            if not positions:
+                return []
+        names = data['names']
+        return [
+            position for position in sorted(positions)
+            if value in names[position]
+        ]
+
+
+ingredient_index = IngredientIndex(settings.INGREDIENT_INDEX_MAX_AGE)
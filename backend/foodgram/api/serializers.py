@@ -1,16 +1,35 @@
-from collections import OrderedDict
-
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 from djoser.serializers import (CurrentPasswordSerializer, PasswordSerializer,
                                 UserCreateSerializer, UserSerializer)
 from drf_extra_fields.fields import Base64ImageField
 from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from recipes.signals import bump_shopping_cart_versions
 from rest_framework import serializers
-from users.models import User
+from tasks.models import Task
+from users.models import Subscription, User
+
+from .fields import PreloadedPrimaryKeyRelatedField, ThumbnailImageField
+from .metrics import TimedSerializerMixin
+from .recipe_cache import purge_recipe_responses
+
+
+def get_followed_author_ids(request):
+    """Returns the ids of the authors followed by the requesting user.
+
+    The ids are loaded with a single query and cached on the request, so
+    all the users rendered while handling it share the same lookup.
+    """
+    if not hasattr(request, 'followed_author_ids'):
+        request.followed_author_ids = set(
+            Subscription.objects.filter(
+                user=request.user).values_list('author_id', flat=True)
+        )
+    return request.followed_author_ids
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+class CustomUserCreateSerializer(TimedSerializerMixin, UserCreateSerializer):
     """Custom serializer for new users registration."""
 
     class Meta:
@@ -28,7 +47,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         return value
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     """Custom serializer for displaying information on users."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -41,10 +60,14 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return obj.following.filter(user=request.user).exists()
+        if obj.pk == request.user.pk:
+            return False
+        return obj.pk in get_followed_author_ids(request)
 
 
 class CustomSetPasswordRetypeSerializer(
@@ -59,7 +82,6 @@ class SubscriptionSerializer(CustomUserSerializer):
     """Serializer to subscribe to other recipe authors."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -70,19 +92,29 @@ class SubscriptionSerializer(CustomUserSerializer):
         depth = 1
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['request'].GET.get('recipes_limit')
-        if recipes_limit:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
         else:
-            recipes = obj.recipes.all()
+            recipes_limit = self.context['request'].GET.get('recipes_limit')
+            if recipes_limit:
+                recipes = obj.recipes.all()[:int(recipes_limit)]
+            else:
+                recipes = obj.recipes.all()
         return RecipeLightSerializer(
             recipes, many=True, read_only=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
 
+class BulkIdsSerializer(serializers.Serializer):
+    """Serializer for the ids of recipes or authors changed at once."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS
+    )
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
@@ -90,7 +122,9 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Serializer for ingredients."""
 
     class Meta:
@@ -111,27 +145,29 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
+class RecipeCreateIngredientsListSerializer(serializers.ListSerializer):
+    """List serializer loading all the submitted ingredients at once."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].preload([
+                item.get('id') for item in data if isinstance(item, dict)])
+        return super().to_internal_value(data)
+
+
 class RecipeCreateIngredientsSerializer(serializers.ModelSerializer):
-    """Serializer to display ingredients during recipe creation."""
+    """Serializer to add ingredients during recipe creation."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = PreloadedPrimaryKeyRelatedField(
         source='ingredient', queryset=Ingredient.objects.all())
 
     class Meta:
         model = RecipeIngredients
         fields = ('id', 'amount',)
-
-    def to_representation(self, instance):
-        old_repr = super().to_representation(instance)
-        new_repr = OrderedDict()
-        new_repr['id'] = old_repr['id']
-        new_repr['name'] = instance.ingredient.name
-        new_repr['measurement_unit'] = instance.ingredient.measurement_unit
-        new_repr['amount'] = old_repr['amount']
-        return new_repr
+        list_serializer_class = RecipeCreateIngredientsListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for displaying recipes."""
 
     tags = TagSerializer(many=True)
@@ -140,7 +176,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True, source='recipeingredients')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = ThumbnailImageField('card', list_only=True)
 
     class Meta:
         model = Recipe
@@ -150,12 +186,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return obj.is_favorited(request.user)
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -165,10 +205,11 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeCreateSerializer(RecipeSerializer):
     """Serializer for creating and updating recipes."""
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = PreloadedPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
     ingredients = RecipeCreateIngredientsSerializer(
         source='recipeingredients', many=True)
+    image = Base64ImageField()
 
     def validate(self, attrs):
         if len(attrs['tags']) > len(set(attrs['tags'])):
@@ -196,41 +237,115 @@ class RecipeCreateSerializer(RecipeSerializer):
             for current_ingredient in ingredients
         ]
         RecipeIngredients.objects.bulk_create(recipe_ingredients)
+        return recipe_ingredients
+
+    def keep_written_relations(self, tags, recipe_ingredients):
+        """Keeps the objects just written to render the response from."""
+        self.written_relations = {
+            'tags': sorted(tags, key=lambda tag: tag.pk),
+            'recipeingredients': recipe_ingredients,
+        }
 
     @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipeingredients')
         recipe = Recipe.objects.create(**validated_data)
+        recipe.favorited = recipe.in_shopping_cart = False
         recipe.tags.set(tags)
-        self.set_recipe_ingredients(recipe, ingredients)
+        self.keep_written_relations(
+            tags, self.set_recipe_ingredients(recipe, ingredients))
         return recipe
 
+    def update_recipe_ingredients(self, recipe, ingredients):
+        """Writes only the differences from the current ingredients.
+
+        Ingredients that are gone are deleted, changed amounts are
+        updated in bulk and new ingredients are inserted, so the rows
+        that did not change keep their ids and are not touched at all.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredients.select_related(
+                'ingredient')
+        }
+        recipe_ingredients, changed, added = [], [], []
+        for item in ingredients:
+            recipe_ingredient = current.pop(item['ingredient'].pk, None)
+            if recipe_ingredient is None:
+                recipe_ingredient = RecipeIngredients(
+                    recipe=recipe,
+                    ingredient=item['ingredient'],
+                    amount=item['amount'],
+                )
+                added.append(recipe_ingredient)
+            elif recipe_ingredient.amount != item['amount']:
+                recipe_ingredient.amount = item['amount']
+                changed.append(recipe_ingredient)
+            recipe_ingredients.append(recipe_ingredient)
+        if current:
+            RecipeIngredients.objects.filter(
+                pk__in=[item.pk for item in current.values()]).delete()
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredients.objects.bulk_create(added)
+        if changed or added:
+            # Bulk writes send no signals.
+            bump_shopping_cart_versions(
+                User.objects.filter(shopping__recipe=recipe))
+            purge_recipe_responses([f'recipe:{recipe.pk}'])
+        return recipe_ingredients
+
     @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipeingredients')
-        instance.ingredients.clear()
-        instance.tags.clear()
         super().update(instance, validated_data)
+        # set() only removes and adds the tags that differ.
         instance.tags.set(tags)
-        self.set_recipe_ingredients(instance, ingredients)
+        self.keep_written_relations(
+            tags, self.update_recipe_ingredients(instance, ingredients))
         return instance
 
     def to_representation(self, instance):
-        repr = super().to_representation(instance)
-        tag_id_list, tag_list = repr['tags'], []
-        for tag_id in tag_id_list:
-            tag = get_object_or_404(Tag, id=tag_id)
-            serialized_tag = OrderedDict(TagSerializer(tag).data)
-            tag_list.append(serialized_tag)
-        repr['tags'] = tag_list
-        return repr
+        if hasattr(self, 'written_relations'):
+            instance._prefetched_objects_cache = self.written_relations
+        return RecipeSerializer(instance, context=self.context).data
 
 
-class RecipeLightSerializer(serializers.ModelSerializer):
+class RecipeLightSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Serializer for displaying recipes on the subscriptions page."""
 
+    image = ThumbnailImageField('small')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class ShoppingListExportSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    """Serializer for displaying shopping list export jobs."""
+
+    format = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = ('id', 'status', 'format', 'url', 'created', 'finished')
+
+    def get_format(self, obj):
+        return obj.kwargs['file_format']
+
+    def get_url(self, obj):
+        if obj.status != Task.DONE:
+            return None
+        url = default_storage.url(obj.result['file'])
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -0,0 +1,149 @@
+import csv
+from io import StringIO
+
+from django.conf import settings
+from recipes.models import RecipeIngredients
+from users.models import User
+
+from .cache import LRUCache
+from .pdf import render_pages
+
+HEADER = 'Список покупок'
+HEADER_FONT_SIZE = 20
+BODY_FONT_SIZE = 15
+HEADER_LEFT_MARGIN = 100
+BODY_LEFT_MARGIN = 80
+HEADER_HEIGHT = 770
+BODY_FIRST_LINE_HEIGHT = 740
+LINE_SPACING = 20
+BOTTOM_MARGIN = 100
+BULLET_POINT_SYMBOL = '•'
+
+# Maps user ids to (shopping_cart_version, document) pairs, so every user
+# keeps at most one rendered document in memory.
+documents_cache = LRUCache(
+    settings.SHOPPING_LIST_CACHE_SIZE, sizeof=lambda item: len(item[1]))
+
+
+def get_shopping_list(user):
+    """Returns ingredient totals and their source recipes for a user's cart.
+
+    All the rows are fetched with one joined query and grouped in memory,
+    so the cost does not depend on the number of recipes in the cart.
+    Each item is a (name, measurement_unit, total, recipes) tuple, where
+    recipes is a list of (recipe_name, amount) pairs.
+    """
+    rows = RecipeIngredients.objects.filter(
+        recipe__shopping__user=user
+    ).order_by('ingredient', 'recipe').values_list(
+        'ingredient__name', 'ingredient__measurement_unit',
+        'recipe__name', 'amount'
+    )
+    shopping_list = {}
+    for name, unit, recipe_name, amount in rows:
+        item = shopping_list.setdefault((name, unit), [0, []])
+        item[0] += amount
+        item[1].append((recipe_name, amount))
+    return [
+        (name, unit, total, recipes)
+        for (name, unit), (total, recipes) in shopping_list.items()
+    ]
+
+
+def get_shopping_list_lines(shopping_list):
+    """Yields the text lines of the shopping list body."""
+    for name, unit, total, recipes in shopping_list:
+        yield f'{BULLET_POINT_SYMBOL} {name} - {total} {unit}'
+        for recipe_name, amount in recipes:
+            yield f'  {recipe_name} ({amount})'
+
+
+def layout_shopping_list(shopping_list):
+    """Splits the shopping list into pages of positioned text lines."""
+    pages = [[(HEADER_FONT_SIZE, HEADER_LEFT_MARGIN, HEADER_HEIGHT, HEADER)]]
+    y_coordinate = BODY_FIRST_LINE_HEIGHT
+    for text in get_shopping_list_lines(shopping_list):
+        if y_coordinate <= BOTTOM_MARGIN:
+            pages.append([])
+            y_coordinate = BODY_FIRST_LINE_HEIGHT
+        pages[-1].append(
+            (BODY_FONT_SIZE, BODY_LEFT_MARGIN, y_coordinate, text))
+        y_coordinate -= LINE_SPACING
+    return pages
+
+
+def render_shopping_list(shopping_list):
+    """Yields the PDF document of the shopping list page by page."""
+    return render_pages(layout_shopping_list(shopping_list))
+
+
+def render_shopping_list_csv(shopping_list):
+    """Yields the shopping list as CSV rows, one row per ingredient."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['name', 'measurement_unit', 'amount', 'recipes'])
+    for name, unit, total, recipes in shopping_list:
+        writer.writerow([
+            name, unit, total,
+            '; '.join(f'{recipe_name} ({amount})'
+                      for recipe_name, amount in recipes)
+        ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def render_shopping_list_text(shopping_list):
+    """Yields the shopping list as plain text lines."""
+    yield f'{HEADER}\n\n'.encode()
+    for name, unit, total, recipes in shopping_list:
+        yield f'{BULLET_POINT_SYMBOL} {name} - {total} {unit}\n'.encode()
+        for recipe_name, amount in recipes:
+            yield f'  {recipe_name} ({amount})\n'.encode()
+
+
+# Maps export formats, which are also the file extensions, to renderers.
+EXPORT_RENDERERS = {
+    'pdf': render_shopping_list,
+    'csv': render_shopping_list_csv,
+    'txt': render_shopping_list_text,
+}
+
+
+def get_shopping_cart_version(user):
+    """Returns the cart version of the user from the database.
+
+    request.user may be a copy from the token cache, and the version is
+    bumped with queries that do not drop the cached tokens.
+    """
+    return User.objects.values_list(
+        'shopping_cart_version', flat=True).get(pk=user.pk)
+
+
+def get_shopping_list_etag(user, version):
+    return f'"shopping-list-{user.pk}-{version}"'
+
+
+def get_cached_document(user, version):
+    """Returns the rendered document of the cart version if any."""
+    cached_version, document = documents_cache.get(user.pk, (None, None))
+    if cached_version == version:
+        return document
+    return None
+
+
+def cache_document(user, version, chunks):
+    """Yields the document chunks and caches the document once complete.
+
+    Documents that do not fit into the cache are not collected at all,
+    so streaming them keeps using bounded memory.
+    """
+    document, size = [], 0
+    for chunk in chunks:
+        yield chunk
+        size += len(chunk)
+        if size <= documents_cache.max_size:
+            document.append(chunk)
+    if size <= documents_cache.max_size:
+        documents_cache.set(user.pk, (version, b''.join(document)))
@@ -0,0 +1,139 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from recipes.signals import recipe_image_processed
+from rest_framework.authtoken.models import Token
+from tasks.models import Task
+from users.models import Subscription, User
+
+from .authentication import token_cache
+from .pagination import count_cache
+from .recipe_cache import purge_recipe_responses, recipe_cache
+from .reference import ingredients_payload, tags_payload
+from .search import ingredient_index
+from .tasks import export_shopping_list
+
+# User fields displayed with the recipes of the user.
+DISPLAYED_USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+def clear_recipe_responses():
+    recipe_cache.clear()
+    transaction.on_commit(recipe_cache.clear)
+
+
+def forget_tokens(keys):
+    """Drops the cached tokens now and once the transaction commits."""
+    keys = list(keys)
+    token_cache.delete(keys)
+    transaction.on_commit(lambda: token_cache.delete(keys))
+
+
+def get_tag_groups(tags):
+    return [f'tag:{slug}' for slug in tags.values_list('slug', flat=True)]
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    ingredient_index.invalidate()
+    ingredients_payload.invalidate()
+    clear_recipe_responses()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    tags_payload.invalidate()
+    clear_recipe_responses()
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Purges the responses displaying the user if they change."""
+    if instance._state.adding:
+        return
+    fields = [
+        field for field in DISPLAYED_USER_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    if not fields:
+        return
+    saved = User.objects.filter(pk=instance.pk).values(*fields).first()
+    if saved is not None and any(
+            saved[field] != getattr(instance, field) for field in fields):
+        purge_recipe_responses([f'author:{instance.pk}'])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, signal, created=False,
+                 update_fields=None, **kwargs):
+    if created or signal is post_delete:
+        count_cache.clear()
+    # Password changes and deactivation must apply to the next request.
+    if (signal is post_save and not created
+            and (update_fields is None
+                 or set(update_fields) != {'last_login'})):
+        forget_tokens(Token.objects.filter(
+            user=instance).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+@receiver(recipe_image_processed, sender=Recipe)
+def recipe_changed(sender, instance, signal, created=False, **kwargs):
+    if created or signal is pre_delete:
+        count_cache.clear()
+    groups = ['all', f'author:{instance.author_id}', f'recipe:{instance.pk}']
+    if not created:
+        groups += get_tag_groups(instance.tags.all())
+    purge_recipe_responses(groups)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['pre_clear', 'post_add', 'post_remove']:
+        return
+    count_cache.clear()
+    if reverse:
+        clear_recipe_responses()
+        return
+    tags = instance.tags.all()
+    if pk_set is not None:
+        tags = Tag.objects.filter(pk__in=pk_set)
+    purge_recipe_responses(
+        [f'recipe:{instance.pk}'] + get_tag_groups(tags))
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    purge_recipe_responses([f'recipe:{instance.recipe_id}'])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def filtered_lists_changed(sender, **kwargs):
+    count_cache.clear()
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    """Deletes the file of an expired shopping list export."""
+    if instance.name == export_shopping_list.task_name and instance.result:
+        name = instance.result['file']
+        transaction.on_commit(lambda: default_storage.delete(name))
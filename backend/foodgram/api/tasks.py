@@ -0,0 +1,27 @@
+from uuid import uuid4
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from tasks.queue import task
+from users.models import User
+
+from .shopping_list import EXPORT_RENDERERS, get_shopping_list
+
+EXPORT_DIRECTORY = 'shopping_lists'
+
+
+@task()
+def export_shopping_list(user_id, file_format):
+    """Renders the user's shopping list to a file in the media storage.
+
+    File names are random, so the download links cannot be guessed.
+    Files are deleted with their task, TASKS_RETENTION seconds after it
+    finished.
+    """
+    user = User.objects.get(pk=user_id)
+    content = b''.join(
+        EXPORT_RENDERERS[file_format](get_shopping_list(user)))
+    name = default_storage.save(
+        f'{EXPORT_DIRECTORY}/{uuid4().hex}.{file_format}',
+        ContentFile(content))
+    return {'file': name}
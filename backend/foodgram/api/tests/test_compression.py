@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import brotli
+from api.compression import choose_encoding
+from api.middleware import CompressionMiddleware
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from recipes.models import ShoppingCart
+from rest_framework.test import APIClient
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+DECOMPRESS = {'br': brotli.decompress, 'gzip': gzip.decompress}
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTest(TestCase):
+    """API responses are compressed with the coding the client prefers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        recipes = create_recipes(
+            create_user(1), 6, create_tags(3), create_ingredients(5))
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[0])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get(self, url, accept_encoding):
+        clear_caches()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_preferred_coding(self):
+        plain = self.get('/api/recipes/', '').content
+        cases = [
+            ('gzip', 'gzip'),
+            ('br', 'br'),
+            ('gzip, deflate, br', 'br'),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('br;q=0, *', 'gzip'),
+        ]
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get('/api/recipes/', accept_encoding)
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(
+                    int(response['Content-Length']), len(response.content))
+                self.assertEqual(
+                    DECOMPRESS[encoding](response.content), plain)
+
+    def test_uncompressed(self):
+        for accept_encoding in ('', 'identity', 'gzip;q=0, br;q=0'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get('/api/recipes/', accept_encoding)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(len(response.json()['results']), 6)
+
+    def test_small_responses_are_not_compressed(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.get('/api/recipes/', 'gzip, br')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(len(response.json()['results']), 6)
+
+    def test_shopping_list_stream_is_not_compressed(self):
+        self.client.force_authenticate(self.user)
+        response = self.get(
+            '/api/recipes/download_shopping_cart/', 'gzip, br')
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertTrue(b''.join(response.streaming_content).startswith(
+            b'%PDF'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareETagTest(SimpleTestCase):
+    """Compressed responses keep their ETag, marked as weak."""
+
+    def get_response(self, path, etag):
+        response = HttpResponse(
+            json.dumps([{'name': 'Recipe'}] * 50),
+            content_type='application/json')
+        response['ETag'] = etag
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(
+            RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip'))
+
+    def test_etag_is_weakened(self):
+        response = self.get_response('/api/recipes/', '"digest"')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"digest"')
+        response = self.get_response('/api/recipes/', 'W/"digest"')
+        self.assertEqual(response['ETag'], 'W/"digest"')
+
+    def test_other_paths_are_not_compressed(self):
+        response = self.get_response('/admin/', '"digest"')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['ETag'], '"digest"')
+
+    def test_choose_encoding(self):
+        self.assertIsNone(choose_encoding(''))
+        self.assertIsNone(choose_encoding('deflate'))
+        self.assertEqual(choose_encoding('GZIP;q=0.1, br;q=x'), 'gzip')
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from recipes.models import Favorite, Recipe
+from rest_framework.test import APIClient
+from users.models import Subscription, User
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class CountersTest(TestCase):
+    """The counters follow the rows they count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+        cls.tags, cls.ingredients = create_tags(1), create_ingredients(1)
+        cls.recipe, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_counters(self, favorites, in_carts, recipes, followers):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count,
+             author.recipes_count, author.followers_count),
+            (favorites, in_carts, recipes, followers))
+
+    def test_single_toggles(self):
+        urls = [
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            f'/api/users/{self.author.pk}/subscribe/',
+        ]
+        for url in urls:
+            self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_counters(1, 1, 1, 1)
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.data['results'][0]['recipes_count'], 1)
+        for url in urls:
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assert_counters(0, 0, 1, 0)
+
+    def test_bulk_toggles(self):
+        self.client.post(
+            '/api/recipes/favorite/', {'ids': [self.recipe.pk]},
+            format='json')
+        self.client.post(
+            '/api/recipes/shopping_cart/', {'ids': [self.recipe.pk]},
+            format='json')
+        self.client.post(
+            '/api/users/subscribe/', {'ids': [self.author.pk]},
+            format='json')
+        self.assert_counters(1, 1, 1, 1)
+        self.client.delete('/api/recipes/shopping_cart/')
+        self.assert_counters(1, 0, 1, 1)
+
+    def test_model_saves_and_deletes(self):
+        favorite = Favorite.objects.create(user=self.user, recipe=self.recipe)
+        subscription = Subscription.objects.create(
+            user=self.user, author=self.author)
+        recipe = Recipe.objects.create(
+            author=self.author, name='Other recipe',
+            image='recipes/recipe.jpg', text='Text', cooking_time=10)
+        self.assert_counters(1, 0, 2, 1)
+        favorite.delete()
+        subscription.delete()
+        recipe.delete()
+        self.assert_counters(0, 0, 1, 0)
+
+    def test_recount_fixes_drift(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, in_carts_count=2)
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=0, followers_count=3)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assert_counters(1, 0, 1, 0)
+        self.assertIn('Recipe.favorites_count: 1 fixed', out.getvalue())
+        self.assertIn('User.followers_count: 1 fixed', out.getvalue())
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertNotIn('1 fixed', out.getvalue())
@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+from recipes.models import Favorite, ShoppingCart
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class FastReadsParityTest(TestCase):
+    """Responses built from .values() rows match the serializers ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        tags, ingredients = create_tags(3), create_ingredients(4)
+        for number in (1, 2, 3):
+            author = create_user(number)
+            recipes = create_recipes(author, 3, tags[:number], ingredients)
+            if number != 3:
+                Subscription.objects.create(user=cls.user, author=author)
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[1])
+        cls.recipe = recipes[0]
+        cls.author = author
+
+    def setUp(self):
+        self.anonymous_client = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, client, url, fast_reads):
+        clear_caches()
+        with override_settings(API_FAST_READS=fast_reads):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assert_parity(self, url):
+        for client in (self.anonymous_client, self.client):
+            with self.subTest(url=url, client=client):
+                self.assertEqual(
+                    self.get(client, url, True),
+                    self.get(client, url, False)
+                )
+
+    def test_recipes(self):
+        self.assert_parity('/api/recipes/')
+        self.assert_parity('/api/recipes/?tags=tag0&tags=tag2&limit=4')
+        self.assert_parity(f'/api/recipes/{self.recipe.pk}/')
+
+    def test_users(self):
+        self.assert_parity('/api/users/')
+        self.assert_parity(f'/api/users/{self.author.pk}/')
+
+    def test_subscriptions(self):
+        for url in ('/api/users/subscriptions/',
+                    '/api/users/subscriptions/?recipes_limit=2'):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get(self.client, url, True),
+                    self.get(self.client, url, False)
+                )
+
+
+class BulkValidationTest(TestCase):
+    """Validation errors of the bulk endpoints are rendered as 400."""
+
+    def test_invalid_ids(self):
+        client = APIClient()
+        client.force_authenticate(create_user(0))
+        response = client.post(
+            '/api/recipes/favorite/', {'ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0', response.json()['ids'])
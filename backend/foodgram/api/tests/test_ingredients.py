@@ -0,0 +1,65 @@
+from api.filters import IngredientFilter
+from api.search import ingredient_index
+from django.db import connection
+from django.test import TestCase
+from recipes.models import Ingredient
+from rest_framework.test import APIClient
+
+# Not in alphabetical order, so that the primary key order differs.
+NAMES = [
+    'рисовая мука', 'сахарная пудра', 'Соль', 'морская соль', 'мука',
+    'Сахар', 'пудра сахарная', 'мускатный орех', 'salt', 'Sea Salt',
+]
+QUERIES = [
+    'а', 'м', 'му', 'мука', 'муска', 'пудра', ' мука ', 'SALT', 'Sea', 'xyz',
+]
+# Queries matching Cyrillic names of another case, which the LIKE of
+# SQLite does not find, unlike the one of PostgreSQL.
+CYRILLIC_CASE_QUERIES = ['с', 'сахар', 'САХАР', 'Соль', 'соль']
+
+
+class IngredientSearchTest(TestCase):
+    """The search index finds the same ingredients as IngredientFilter."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NAMES:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/ingredients/', {'name': query})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def filter(self, query):
+        queryset = IngredientFilter(
+            {'name': query}, queryset=Ingredient.objects.all()).qs
+        return list(queryset.values_list('name', flat=True))
+
+    def test_parity_with_filter(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), self.filter(query))
+
+    def test_parity_with_filter_across_cyrillic_case(self):
+        if connection.vendor == 'sqlite':
+            self.skipTest('SQLite LIKE only ignores the case of ASCII.')
+        for query in CYRILLIC_CASE_QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), self.filter(query))
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(
+            self.search('сахар'),
+            ['сахарная пудра', 'Сахар', 'пудра сахарная'])
+        self.assertEqual(self.search('СОЛ'), ['Соль', 'морская соль'])
+        self.assertEqual(
+            self.search('мука'), ['мука', 'рисовая мука'])
+        self.assertEqual(
+            self.search('с'),
+            ['сахарная пудра', 'Соль', 'Сахар', 'рисовая мука',
+             'морская соль', 'пудра сахарная', 'мускатный орех'])
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from api.metrics import (MetricsStore, RequestTimings, RouteMetrics,
+                         merge_caches, merge_routes)
+from django.test import SimpleTestCase
+
+
+def get_snapshot(requests, hits, misses):
+    metrics = RouteMetrics()
+    for _ in range(requests):
+        timings = RequestTimings()
+        timings.queries = 3
+        timings.finish()
+        metrics.observe('RecipeViewSet.list', timings)
+    return {
+        'routes': metrics.snapshot(),
+        'caches': {'recipes': {
+            'hits': hits, 'misses': misses, 'hit_ratio': 0,
+            'entries': 1, 'size': 10,
+        }},
+    }
+
+
+def get_exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class MetricsStoreTest(SimpleTestCase):
+    """The metrics views add up the metrics of the running processes."""
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write_snapshot(self, pid, snapshot):
+        path = self.directory / f'{pid}-other.json'
+        path.write_text(json.dumps(snapshot))
+        return path
+
+    def test_processes_are_added_up(self):
+        self.write_snapshot(os.getppid(), get_snapshot(2, 1, 3))
+        snapshots = MetricsStore(self.directory, 10).load(
+            get_snapshot(1, 3, 1))
+        self.assertEqual(len(snapshots), 2)
+        histograms = merge_routes(snapshots)['RecipeViewSet.list']
+        self.assertEqual(histograms['queries']['count'], 3)
+        self.assertEqual(histograms['queries']['buckets']['5'], 3)
+        self.assertEqual(histograms['total']['buckets']['+Inf'], 3)
+        self.assertEqual(merge_caches(snapshots)['recipes'], {
+            'hits': 4, 'misses': 4, 'entries': 2, 'size': 20,
+            'hit_ratio': 0.5,
+        })
+
+    def test_exited_processes_are_pruned(self):
+        exited = self.write_snapshot(get_exited_pid(), get_snapshot(2, 1, 1))
+        stale = self.write_snapshot(os.getpid(), get_snapshot(2, 1, 1))
+        snapshots = MetricsStore(self.directory, 10).load(
+            get_snapshot(1, 0, 0))
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(merge_caches(snapshots)['recipes']['entries'], 1)
+        self.assertFalse(exited.exists())
+        self.assertFalse(stale.exists())
+
+    def test_saved_once_per_interval(self):
+        store = MetricsStore(self.directory, 10)
+        store.save(lambda: get_snapshot(2, 0, 0))
+        store.save(lambda: get_snapshot(5, 0, 0))
+        path, = self.directory.glob('*.json')
+        routes = json.loads(path.read_text())['routes']
+        self.assertEqual(routes['RecipeViewSet.list']['total']['count'], 2)
+        store.interval = 0
+        store.save(lambda: get_snapshot(5, 0, 0))
+        routes = json.loads(path.read_text())['routes']
+        self.assertEqual(routes['RecipeViewSet.list']['total']['count'], 5)
+
+    def test_own_file_is_replaced_by_live_snapshot(self):
+        store = MetricsStore(self.directory, 10)
+        store.save(lambda: get_snapshot(2, 0, 0))
+        snapshots = store.load(get_snapshot(5, 0, 0))
+        self.assertEqual(len(snapshots), 1)
+        routes = merge_routes(snapshots)
+        self.assertEqual(routes['RecipeViewSet.list']['total']['count'], 5)
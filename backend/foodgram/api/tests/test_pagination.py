@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class CursorPaginationTest(TestCase):
+    """Cursor pages cover the feeds in order, each at the same cost."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        tags, ingredients = create_tags(1), create_ingredients(1)
+        for number in range(1, 8):
+            author = create_user(number)
+            create_recipes(author, 2, tags, ingredients)
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_cursor_pages(self, url, expected_ids):
+        ids, queries = [], set()
+        while url:
+            clear_caches()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            queries.add(len(context))
+            url = response.data['next']
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(len(queries), 1)
+
+    def test_recipes(self):
+        self.assert_cursor_pages(
+            '/api/recipes/?pagination=cursor&limit=3',
+            list(Recipe.objects.order_by(
+                '-pub_date', '-id').values_list('id', flat=True)))
+
+    def test_subscriptions(self):
+        self.assert_cursor_pages(
+            '/api/users/subscriptions/?pagination=cursor&limit=2',
+            list(Subscription.objects.filter(user=self.user).order_by(
+                '-pk').values_list('author', flat=True)))
+
+    def test_page_numbers_by_default(self):
+        response = self.client.get('/api/recipes/?limit=3&page=2')
+        self.assertEqual(response.data['count'], 14)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class CachedCountTest(TestCase):
+    """Page counts are reused until the counted rows change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags, cls.ingredients = create_tags(2), create_ingredients(1)
+        cls.recipes = create_recipes(
+            cls.author, 3, cls.tags, cls.ingredients)
+
+    def setUp(self):
+        clear_caches()
+        # Authenticated, so that whole responses are not cached.
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_count(self):
+        return self.client.get('/api/recipes/?tags=tag1').data['count']
+
+    def test_count_is_cached(self):
+        self.assertEqual(self.get_count(), 3)
+        # Deleting the through rows in bulk sends no m2m_changed signal.
+        Recipe.tags.through.objects.filter(
+            recipe=self.recipes[0], tag=self.tags[1]).delete()
+        self.assertEqual(self.get_count(), 3)
+        clear_caches()
+        self.assertEqual(self.get_count(), 2)
+
+    def test_recipe_changes_clear_counts(self):
+        self.assertEqual(self.get_count(), 3)
+        recipe, = create_recipes(
+            create_user(1), 1, self.tags, self.ingredients)
+        self.assertEqual(self.get_count(), 4)
+        recipe.tags.set(self.tags[:1])
+        self.assertEqual(self.get_count(), 3)
+        recipe.tags.add(self.tags[1])
+        self.assertEqual(self.get_count(), 4)
+        recipe.delete()
+        self.assertEqual(self.get_count(), 3)
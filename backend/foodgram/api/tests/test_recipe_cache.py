@@ -0,0 +1,77 @@
+from api.recipe_cache import RecipeResponseCache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class RecipeResponseCacheTest(TestCase):
+    """Anonymous recipe responses are only purged by what they display."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(1)
+        cls.recipe, = create_recipes(
+            cls.author, 1, create_tags(1), create_ingredients(1))
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def assert_cache_status(self, url, status):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], status)
+
+    def assert_cached(self, change, status):
+        urls = ['/api/recipes/', f'/api/recipes/{self.recipe.pk}/']
+        for url in urls:
+            self.client.get(url)
+        change()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_cache_status(url, status)
+
+    def test_signup_keeps_responses(self):
+        self.assert_cached(lambda: create_user(2), 'HIT')
+
+    def test_password_change_keeps_responses(self):
+        def change():
+            self.author.set_password('new-password')
+            self.author.save()
+
+        self.assert_cached(change, 'HIT')
+
+    def test_login_keeps_responses(self):
+        def change():
+            self.author.last_name = 'Changed'
+            self.author.save(update_fields=['last_login'])
+
+        self.assert_cached(change, 'HIT')
+
+    def test_displayed_field_change_purges_responses(self):
+        def change():
+            self.author.first_name = 'Changed'
+            self.author.save()
+
+        self.assert_cached(change, 'MISS')
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(
+            response.json()['results'][0]['author']['first_name'], 'Changed')
+
+
+class RecipeResponseCacheGroupsTest(SimpleTestCase):
+    """The generations of the purged groups are bounded."""
+
+    def test_generations_are_capped(self):
+        cache = RecipeResponseCache(1024, 60, max_groups=2)
+        cache.set('detail:1', ['recipe:1'], b'{}')
+        self.assertEqual(cache.get('detail:1'), b'{}')
+        cache.purge(['recipe:1'])
+        cache.set('detail:1', ['recipe:1'], b'{}')
+        cache.set('detail:2', ['recipe:2'], b'{}')
+        cache.purge(['recipe:3', 'recipe:4'])
+        self.assertLessEqual(len(cache.generations), 2)
+        self.assertIsNone(cache.get('detail:1'))
+        self.assertIsNone(cache.get('detail:2'))
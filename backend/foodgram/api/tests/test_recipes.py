@@ -0,0 +1,210 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from recipes.models import Favorite, ShoppingCart
+from rest_framework.test import APIClient
+from users.models import User
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+# Queries of a recipe list page, whatever its size: the tag filter choices,
+# the count, the page, its tags and its ingredients, plus the followed
+# authors for users.
+RECIPE_LIST_QUERIES = 5
+RECIPE_LIST_USER_QUERIES = 6
+# Queries of a recipe create and of an update replacing a tag and an
+# ingredient, whatever the number of tags and ingredients, including the
+# savepoints of the test transaction. Every removed ingredient costs a
+# signal query.
+RECIPE_CREATE_QUERIES = 14
+RECIPE_UPDATE_QUERIES = 22
+IMAGE = (
+    'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAA'
+    'AIBRAA7'
+)
+
+
+class RecipeListQueriesTest(TestCase):
+    """The recipe list costs the same queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        author = create_user(1)
+        create_recipes(author, 10, create_tags(3), create_ingredients(5))
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous_client = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (1, 10):
+            clear_caches()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_queries(self):
+        self.assert_list_queries(
+            self.anonymous_client, RECIPE_LIST_QUERIES)
+        self.assert_list_queries(self.client, RECIPE_LIST_USER_QUERIES)
+
+    @override_settings(API_FAST_READS=False)
+    def test_list_queries_with_serializers(self):
+        self.assert_list_queries(
+            self.anonymous_client, RECIPE_LIST_QUERIES)
+        self.assert_list_queries(self.client, RECIPE_LIST_USER_QUERIES)
+
+
+class RecipeFilterTest(TestCase):
+    """is_favorited and is_in_shopping_cart filter the user's recipes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.tags, cls.ingredients = create_tags(1), create_ingredients(1)
+        cls.recipes = create_recipes(
+            create_user(1), 4, cls.tags, cls.ingredients)
+        for recipe in cls.recipes[:2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[1:3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous_client = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, client, query):
+        clear_caches()
+        response = client.get(f'/api/recipes/?limit=100&{query}')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.data['results']}
+
+    def get_recipe_ids(self, *indexes):
+        return {self.recipes[index].pk for index in indexes}
+
+    def test_user_filters(self):
+        for query, indexes in (
+                ('is_favorited=1', (0, 1)),
+                ('is_favorited=0', (2, 3)),
+                ('is_in_shopping_cart=1', (1, 2)),
+                ('is_in_shopping_cart=0', (0, 3)),
+                ('is_favorited=1&is_in_shopping_cart=1', (1,))):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.get_ids(self.client, query),
+                    self.get_recipe_ids(*indexes))
+
+    def test_anonymous_filters_are_ignored(self):
+        for query in ('is_favorited=1', 'is_favorited=0',
+                      'is_in_shopping_cart=1', 'is_in_shopping_cart=0'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.get_ids(self.anonymous_client, query),
+                    self.get_recipe_ids(0, 1, 2, 3))
+
+    def test_filter_queries(self):
+        for count in (0, 20):
+            other = create_user(count + 2)
+            recipes = create_recipes(
+                other, count, self.tags, self.ingredients)
+            for recipe in recipes:
+                Favorite.objects.create(user=self.user, recipe=recipe)
+                ShoppingCart.objects.create(user=other, recipe=recipe)
+            for query in ('is_favorited=1', 'is_in_shopping_cart=0'):
+                clear_caches()
+                with self.subTest(count=count, query=query):
+                    with self.assertNumQueries(RECIPE_LIST_USER_QUERIES):
+                        self.client.get(f'/api/recipes/?limit=10&{query}')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeWriteQueriesTest(TestCase):
+    """Recipe writes cost the same queries for any number of relations."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags = create_tags(6)
+        cls.ingredients = create_ingredients(10)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_data(self, name, tags, ingredients, amount=1):
+        return {
+            'name': name,
+            'text': 'Text',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in ingredients
+            ],
+        }
+
+    def test_create_queries(self):
+        for size in (1, 5):
+            data = self.get_data(
+                f'Recipe {size}', self.tags[:size], self.ingredients[:size])
+            data['image'] = IMAGE
+            with self.subTest(size=size), self.assertNumQueries(
+                    RECIPE_CREATE_QUERIES):
+                response = self.client.post(
+                    '/api/recipes/', data, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual(len(response.data['tags']), size)
+            self.assertEqual(len(response.data['ingredients']), size)
+
+    def test_update_queries(self):
+        for size in (2, 5):
+            recipe = create_recipes(
+                self.author, 1, self.tags[:size], self.ingredients[:size])[0]
+            recipe.name = f'Recipe {size}'
+            recipe.save()
+            # Replaces a tag and an ingredient and changes the other amounts.
+            data = self.get_data(
+                recipe.name, self.tags[1:size + 1],
+                self.ingredients[1:size + 1], amount=2)
+            with self.subTest(size=size), self.assertNumQueries(
+                    RECIPE_UPDATE_QUERIES):
+                response = self.client.patch(
+                    f'/api/recipes/{recipe.pk}/', data, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(
+                [item['id'] for item in response.data['ingredients']],
+                [ingredient.pk for ingredient in self.ingredients[1:size + 1]]
+            )
+
+    def test_update_bumps_cart_versions(self):
+        recipe = create_recipes(
+            self.author, 1, self.tags[:2], self.ingredients[:3])[0]
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        for ingredients, amount in (
+                (self.ingredients[:3], 2),
+                (self.ingredients[:2], 2),
+                (self.ingredients[:3], 2)):
+            version = User.objects.get(pk=self.author.pk).shopping_cart_version
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                self.get_data(recipe.name, self.tags[:2], ingredients, amount),
+                format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertGreater(
+                User.objects.get(pk=self.author.pk).shopping_cart_version,
+                version)
@@ -0,0 +1,65 @@
+import gzip
+
+from django.test import TestCase, override_settings
+from recipes.models import Ingredient, Tag
+from rest_framework.test import APIClient
+
+from .utils import clear_caches, create_ingredients, create_tags
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class ReferencePayloadTest(TestCase):
+    """Tags and ingredients are served from precomputed payloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_tags(3)
+        create_ingredients(20)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def test_payload_is_built_once(self):
+        for url in ('/api/tags/', '/api/ingredients/'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(len(response.json()), 3)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_tag_change_invalidates_payload(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        Tag.objects.create(name='New', color='#FFFFFF', slug='new')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('new', [tag['slug'] for tag in response.json()])
+
+    def test_ingredient_change_invalidates_payload(self):
+        etag = self.client.get('/api/ingredients/')['ETag']
+        ingredient = Ingredient.objects.first()
+        ingredient.name = 'Renamed'
+        ingredient.save()
+        response = self.client.get(
+            '/api/ingredients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Renamed')
+
+    def test_precompressed_payload(self):
+        body = self.client.get('/api/ingredients/').content
+        response = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith('-gzip"'))
+        self.assertEqual(gzip.decompress(response.content), body)
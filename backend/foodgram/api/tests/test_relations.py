@@ -0,0 +1,160 @@
+from django.test import TestCase
+from recipes.models import Favorite, ShoppingCart
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+MISSING_ID = 10 ** 6
+
+
+class BulkRelationTest(TestCase):
+    """The bulk endpoints report what happened to every id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.authors = [create_user(1), create_user(2)]
+        cls.recipes = create_recipes(
+            cls.authors[0], 3, create_tags(1), create_ingredients(1))
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, ids=None):
+        data = None if ids is None else {'ids': ids}
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item['id'], item['result'])
+            for item in response.json()['results']
+        ]
+
+    def assert_recipe_relation(self, url, model):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        model.objects.create(user=self.user, recipe=self.recipes[0])
+        self.assertEqual(
+            self.request('post', url, [first, second, second, MISSING_ID]),
+            [(first, 'exists'), (second, 'added'),
+             (MISSING_ID, 'not_found')])
+        self.assertEqual(
+            set(model.objects.filter(user=self.user).values_list(
+                'recipe', flat=True)),
+            {first, second})
+        self.assertEqual(
+            self.request('delete', url, [second, third]),
+            [(second, 'removed'), (third, 'absent')])
+        self.assertEqual(
+            list(model.objects.filter(user=self.user).values_list(
+                'recipe', flat=True)),
+            [first])
+
+    def test_favorites(self):
+        self.assert_recipe_relation('/api/recipes/favorite/', Favorite)
+
+    def test_shopping_cart(self):
+        self.assert_recipe_relation(
+            '/api/recipes/shopping_cart/', ShoppingCart)
+
+    def test_shopping_cart_is_cleared(self):
+        ids = [recipe.pk for recipe in self.recipes[:2]]
+        self.request('post', '/api/recipes/shopping_cart/', ids)
+        self.assertEqual(
+            self.request('delete', '/api/recipes/shopping_cart/'),
+            [(ids[0], 'removed'), (ids[1], 'removed')])
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+
+    def test_favorites_are_not_cleared(self):
+        self.request('post', '/api/recipes/favorite/', [self.recipes[0].pk])
+        response = self.client.delete('/api/recipes/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Favorite.objects.filter(user=self.user).exists())
+
+    def test_subscriptions(self):
+        first, second = (author.pk for author in self.authors)
+        self.assertEqual(
+            self.request(
+                'post', '/api/users/subscribe/',
+                [first, self.user.pk, MISSING_ID]),
+            [(first, 'added'), (self.user.pk, 'not_found'),
+             (MISSING_ID, 'not_found')])
+        self.assertEqual(
+            self.request('post', '/api/users/subscribe/', [first, second]),
+            [(first, 'exists'), (second, 'added')])
+        self.assertEqual(
+            self.request('delete', '/api/users/subscribe/', [second]),
+            [(second, 'removed')])
+        self.assertEqual(
+            list(Subscription.objects.filter(user=self.user).values_list(
+                'author', flat=True)),
+            [first])
+
+    def test_anonymous_users_are_refused(self):
+        response = APIClient().post(
+            '/api/recipes/favorite/', {'ids': [self.recipes[0].pk]},
+            format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class SingleRelationTest(TestCase):
+    """The single toggles tell repeated and missing changes apart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+        cls.recipe, = create_recipes(
+            cls.author, 1, create_tags(1), create_ingredients(1))
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_toggles(self, url, model, **fields):
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 201)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('errors', response.json())
+        self.assertEqual(model.objects.filter(**fields).count(), 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertFalse(model.objects.filter(**fields).exists())
+
+    def test_favorite(self):
+        self.assert_toggles(
+            f'/api/recipes/{self.recipe.pk}/favorite/', Favorite,
+            user=self.user, recipe=self.recipe)
+
+    def test_shopping_cart(self):
+        self.assert_toggles(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/', ShoppingCart,
+            user=self.user, recipe=self.recipe)
+
+    def test_subscribe(self):
+        self.assert_toggles(
+            f'/api/users/{self.author.pk}/subscribe/', Subscription,
+            user=self.user, author=self.author)
+
+    def test_subscribe_to_yourself(self):
+        response = self.client.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_missing_targets(self):
+        urls = [
+            f'/api/recipes/{MISSING_ID}/favorite/',
+            f'/api/recipes/{MISSING_ID}/shopping_cart/',
+            f'/api/users/{MISSING_ID}/subscribe/',
+            '/api/recipes/x/favorite/',
+            '/api/users/x/subscribe/',
+        ]
+        for url in urls:
+            for method in ('post', 'delete'):
+                with self.subTest(url=url, method=method):
+                    response = getattr(self.client, method)(url)
+                    self.assertEqual(response.status_code, 404)
@@ -0,0 +1,175 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from api.pdf import get_document_font
+from api.shopping_list import layout_shopping_list, render_shopping_list
+from api.tasks import export_shopping_list
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from pypdf import PdfReader
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from tasks.models import Task
+from tasks.queue import claim_task, delete_finished_tasks, run_task
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class ShoppingListDownloadTest(TestCase):
+    """The download is not cached past a change of the shopping cart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.token = Token.objects.create(user=cls.user)
+        cls.recipes = create_recipes(
+            cls.user, 2, create_tags(1), create_ingredients(2))
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def download(self, **headers):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', **headers)
+        if response.streaming:
+            # Renders the document, which also caches it.
+            b''.join(response.streaming_content)
+        return response
+
+    def test_cart_change_with_cached_token(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        etag = self.download()['ETag']
+        self.assertEqual(
+            self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        url = f'/api/recipes/{self.recipes[1].pk}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ShoppingListExportTest(TestCase):
+    """Shopping lists are exported in background jobs that expire."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        recipe, = create_recipes(
+            cls.user, 1, create_tags(1), create_ingredients(2))
+        cls.user.shopping.create(recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, file_format='txt'):
+        response = self.client.post(
+            '/api/recipes/download_shopping_cart/jobs/',
+            {'format': file_format}, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data['status'], Task.PENDING)
+        self.assertIsNone(response.data['url'])
+        return response.data['id']
+
+    def poll(self, job_id, client=None):
+        return (client or self.client).get(
+            f'/api/recipes/download_shopping_cart/jobs/{job_id}/')
+
+    def run_job(self):
+        task = claim_task()
+        self.assertEqual(task.name, export_shopping_list.task_name)
+        return run_task(task)
+
+    def test_export(self):
+        job_id = self.export()
+        self.assertEqual(self.poll(job_id).data['status'], Task.PENDING)
+        self.assertTrue(self.run_job())
+        response = self.poll(job_id)
+        self.assertEqual(response.data['status'], Task.DONE)
+        name = Task.objects.get(pk=job_id).result['file']
+        self.assertTrue(response.data['url'].endswith(name))
+        with default_storage.open(name) as file:
+            self.assertIn('Ingredient 0', file.read().decode())
+
+    def test_unknown_format(self):
+        response = self.client.post(
+            '/api/recipes/download_shopping_cart/jobs/', {'format': 'doc'},
+            format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_job_of_another_user(self):
+        job_id = self.export()
+        client = APIClient()
+        client.force_authenticate(create_user(1))
+        self.assertEqual(self.poll(job_id, client).status_code, 404)
+
+    def test_failed_job(self):
+        job_id = self.export()
+        Task.objects.filter(pk=job_id).update(max_attempts=1)
+        with mock.patch(
+            'api.tasks.get_shopping_list', side_effect=RuntimeError
+        ), self.assertLogs('tasks.queue', 'WARNING'):
+            self.assertFalse(self.run_job())
+        response = self.poll(job_id)
+        self.assertEqual(response.data['status'], Task.FAILED)
+        self.assertIsNone(response.data['url'])
+
+    def test_expired_jobs_are_deleted_with_their_files(self):
+        old_job_id, job_id = self.export(), self.export()
+        self.run_job()
+        self.run_job()
+        names = [
+            Task.objects.get(pk=pk).result['file']
+            for pk in (old_job_id, job_id)
+        ]
+        Task.objects.filter(pk=old_job_id).update(
+            finished=timezone.now() - timedelta(
+                seconds=settings.TASKS_RETENTION + 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(delete_finished_tasks(), 1)
+        self.assertEqual(self.poll(old_job_id).status_code, 404)
+        self.assertFalse(default_storage.exists(names[0]))
+        self.assertEqual(self.poll(job_id).status_code, 200)
+        self.assertTrue(default_storage.exists(names[1]))
+
+
+class ShoppingListPDFTest(SimpleTestCase):
+    """The PDF documents parse back to the shopping list text."""
+
+    def test_multipage_cyrillic_list(self):
+        # More distinct characters than fit into one font subset.
+        letters = ''.join(chr(code) for code in [
+            *range(0x410, 0x450), *range(0xC0, 0x180), *range(0x391, 0x3A2)])
+        shopping_list = [
+            (f'Ингредиент {number} {letters[number::7]}', 'г', number,
+             [(f'Борщ №{number}', number)])
+            for number in range(90)
+        ]
+        pages = layout_shopping_list(shopping_list)
+        self.assertGreater(len(pages), 2)
+        characters = frozenset(
+            char for lines in pages for _, _, _, line in lines
+            for char in line)
+        self.assertGreater(len(get_document_font(characters).subsets), 1)
+        reader = PdfReader(
+            BytesIO(b''.join(render_shopping_list(shopping_list))))
+        self.assertEqual(len(reader.pages), len(pages))
+        for page, lines in zip(reader.pages, pages):
+            text = page.extract_text()
+            for _, _, _, line in lines:
+                self.assertIn(line.strip(), text)
@@ -0,0 +1,54 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+# Queries of a subscriptions page, whatever its size: the count, the
+# authors and their latest recipes.
+SUBSCRIPTIONS_QUERIES = 3
+
+
+class SubscriptionsQueriesTest(TestCase):
+    """The subscriptions page costs the same queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        tags, ingredients = create_tags(2), create_ingredients(2)
+        for number in range(1, 11):
+            author = create_user(number)
+            create_recipes(author, 4, tags, ingredients)
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_subscriptions_queries(self, recipes_limit):
+        for limit in (1, 10):
+            clear_caches()
+            url = f'/api/users/subscriptions/?limit={limit}'
+            if recipes_limit:
+                url += f'&recipes_limit={recipes_limit}'
+            with self.subTest(limit=limit, recipes_limit=recipes_limit):
+                with self.assertNumQueries(SUBSCRIPTIONS_QUERIES):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                results = response.data['results']
+                self.assertEqual(len(results), limit)
+                for author in results:
+                    self.assertEqual(author['recipes_count'], 4)
+                    self.assertEqual(
+                        len(author['recipes']), recipes_limit or 4)
+
+    def test_subscriptions_queries(self):
+        self.assert_subscriptions_queries(None)
+        self.assert_subscriptions_queries(2)
+
+    @override_settings(API_FAST_READS=False)
+    def test_subscriptions_queries_with_serializers(self):
+        self.assert_subscriptions_queries(None)
+        self.assert_subscriptions_queries(2)
@@ -0,0 +1,60 @@
+from api.pagination import count_cache
+from api.recipe_cache import recipe_cache
+from api.reference import ingredients_payload, tags_payload
+from api.search import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='First',
+        last_name='Last',
+        password='password',
+    )
+
+
+def create_tags(count):
+    return [
+        Tag.objects.create(
+            name=f'Tag {number}', color=f'#{number:06d}', slug=f'tag{number}')
+        for number in range(count)
+    ]
+
+
+def create_ingredients(count):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ingredient {number}', measurement_unit='g')
+        for number in range(count)
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    """Creates recipes of the author with all the tags and ingredients."""
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Recipe {number}',
+            image='recipes/recipe.jpg',
+            text='Text',
+            cooking_time=10,
+        )
+        recipe.tags.set(tags)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def clear_caches():
+    """Clears the in-process caches that would skip queries."""
+    count_cache.clear()
+    recipe_cache.clear()
+    tags_payload.invalidate()
+    ingredients_payload.invalidate()
+    ingredient_index.invalidate()
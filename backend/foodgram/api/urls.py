@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, SelfUserView,
-                    SetPasswordRetypeView, TagViewSet, UserViewSet)
+from .views import (IngredientViewSet, MetricsView, PrometheusMetricsView,
+                    RecipeViewSet, SelfUserView, SetPasswordRetypeView,
+                    TagViewSet, UserViewSet)
 
 router = DefaultRouter()
 router.register('users', UserViewSet)
@@ -13,6 +14,8 @@ router.register('recipes', RecipeViewSet)
 urlpatterns = [
     path('users/me/', SelfUserView.as_view()),
     path('users/set_password/', SetPasswordRetypeView.as_view()),
+    path('metrics/', MetricsView.as_view()),
+    path('metrics/prometheus/', PrometheusMetricsView.as_view()),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
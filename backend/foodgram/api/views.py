@@ -1,45 +1,203 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import (Exists, F, OuterRef, Prefetch, Value, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django_filters import rest_framework as rf_filters
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
                             ShoppingCart, Tag)
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase.pdfmetrics import registerFont
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import mixins, permissions, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from users.models import Subscription, User
+from tasks.models import Task
+from users.models import User
 
+from . import relations
+from .fields import accepts_webp
 from .filters import IngredientFilter, RecipeFilter
+from .metrics import (PROMETHEUS_CONTENT_TYPE, caches_prometheus,
+                      collect_metrics, routes_prometheus)
+from .pagination import (OptionalCursorPaginationMixin, RecipeCursorPagination,
+                         SubscriptionCursorPagination)
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (CustomSetPasswordRetypeSerializer,
+from .recipe_cache import recipe_cache
+from .reference import ingredients_payload, tags_payload
+from .representations import (LIGHT_RECIPE_VALUES, RECIPE_VALUES, USER_VALUES,
+                              represent_recipes, represent_subscriptions,
+                              represent_users)
+from .search import ingredient_index
+from .serializers import (BulkIdsSerializer, CustomSetPasswordRetypeSerializer,
                           CustomUserCreateSerializer, CustomUserSerializer,
                           IngredientSerializer, RecipeCreateSerializer,
                           RecipeLightSerializer, RecipeSerializer,
-                          SubscriptionSerializer, TagSerializer)
+                          ShoppingListExportSerializer, SubscriptionSerializer,
+                          TagSerializer)
+from .shopping_list import (EXPORT_RENDERERS, cache_document,
+                            get_cached_document, get_shopping_cart_version,
+                            get_shopping_list, get_shopping_list_etag,
+                            render_shopping_list)
+from .tasks import export_shopping_list
+
+
+class BulkRelationMixin:
+    """Mixin for the actions adding or removing many objects at once."""
+
+    def add_or_remove_many(self, relation, request, allow_clear=False):
+        """Adds or removes the ids in the request data with one statement.
+
+        Responds with the result for every id: added, exists or not_found
+        when adding, removed or absent when removing. With allow_clear, a
+        DELETE request without ids removes all the objects of the user.
+        """
+        if (allow_clear and request.method == 'DELETE'
+                and 'ids' not in request.data):
+            removed = relation.remove(request.user)
+            return Response({'results': [
+                {'id': target_id, 'result': 'removed'}
+                for target_id in sorted(removed)
+            ]})
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        if request.method == 'DELETE':
+            removed = relation.remove(request.user, ids)
+            results = {
+                target_id: 'removed' if target_id in removed else 'absent'
+                for target_id in ids
+            }
+        else:
+            added = relation.add(request.user, ids)
+            rest = [target_id for target_id in ids if target_id not in added]
+            existing = set()
+            if rest:
+                existing = set(relation.get_targets(
+                    request.user, rest).values_list('pk', flat=True))
+            results = {
+                target_id: (
+                    'added' if target_id in added
+                    else 'exists' if target_id in existing
+                    else 'not_found'
+                )
+                for target_id in ids
+            }
+        return Response({'results': [
+            {'id': target_id, 'result': result}
+            for target_id, result in results.items()
+        ]})
+
+
+class ValuesReadMixin:
+    """Mixin building list and retrieve responses from .values() rows.
+
+    Subclasses define represent(rows), which turns rows with values_fields
+    into the same output as the serializers, skipping instantiating models
+    and serializer fields. Turned off by the API_FAST_READS setting.
+    """
+
+    values_fields = ()
+
+    def get_values_queryset(self):
+        return self.filter_queryset(
+            self.get_queryset()
+        ).prefetch_related(None).values(*self.values_fields)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_READS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.represent(list(queryset)))
+        return self.get_paginated_response(self.represent(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.API_FAST_READS:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.get_values_queryset(),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(self.represent([row])[0])
 
 
 class UserViewSet(
+    BulkRelationMixin, OptionalCursorPaginationMixin, ValuesReadMixin,
     mixins.CreateModelMixin, mixins.ListModelMixin,
     mixins.RetrieveModelMixin, viewsets.GenericViewSet
 ):
     """Viewset for users registration and displaying."""
 
     queryset = User.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = [permissions.AllowAny]
+    cursor_pagination_classes = {
+        'subscriptions': SubscriptionCursorPagination}
+    values_fields = USER_VALUES
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CustomUserCreateSerializer
         return CustomUserSerializer
 
+    def represent(self, rows):
+        return represent_users(rows, self.request)
+
+    def get_latest_recipes(self, authors, recipes_limit):
+        """Returns the latest recipes of the authors.
+
+        Recipes are ranked per author with ROW_NUMBER() OVER (PARTITION BY
+        author), so recipes_limit applies to every author separately.
+        """
+        if not recipes_limit:
+            return Recipe.objects.all()
+        ranked_sql, params = Recipe.objects.filter(
+            author__in=authors
+        ).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=[F('pub_date').desc(), F('pk').desc()],
+            )
+        ).values('pk', 'row_number').query.sql_with_params()
+        return Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT "id" FROM ({ranked_sql}) AS "ranked" '
+            f'WHERE "row_number" <= %s',
+            (*params, recipes_limit)
+        ))
+
+    def prefetch_latest_recipes(self, authors, recipes_limit):
+        """Loads the latest recipes of all the authors with one query."""
+        prefetch_related_objects(
+            authors,
+            Prefetch(
+                'recipes',
+                queryset=self.get_latest_recipes(authors, recipes_limit),
+                to_attr='latest_recipes'
+            )
+        )
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(is_subscribed=Value(True)).order_by('pk')
+        recipes_limit = request.query_params.get('recipes_limit')
+        recipes_limit = int(recipes_limit) if recipes_limit else None
+        if settings.API_FAST_READS:
+            page = self.paginate_queryset(
+                queryset.values('pk', *USER_VALUES, 'recipes_count'))
+            authors = [row['id'] for row in page]
+            recipes = self.get_latest_recipes(
+                authors, recipes_limit
+            ).filter(author__in=authors).values(*LIGHT_RECIPE_VALUES)
+            return self.get_paginated_response(
+                represent_subscriptions(page, recipes))
         page = self.paginate_queryset(queryset)
+        self.prefetch_latest_recipes(page, recipes_limit)
         serializer = SubscriptionSerializer(
             page,
             many=True,
@@ -57,28 +215,27 @@ class UserViewSet(
         permission_classes=[permissions.IsAuthenticated]
     )
     def subscribe(self, request, pk):
-        author = get_object_or_404(User, id=pk)
-        subscription = Subscription.objects.filter(
-            user=request.user, author=author)
-        if request.method == 'DELETE' and not subscription:
+        relation = relations.subscriptions
+        if request.method == 'DELETE':
+            if relation.remove(request.user, [int(pk)]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=pk)
             return Response(
                 {'errors': 'Unable to delete non-existent subscription.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if request.method == 'DELETE':
-            subscription.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        if subscription:
+        author = get_object_or_404(User, id=pk)
+        if author == request.user:
             return Response(
-                {'errors': 'You are already following this user.'},
+                {'errors': 'Unable to subscribe to yourself.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if author == request.user:
+        if not relation.add(request.user, [author.pk]):
             return Response(
-                {'errors': 'Unable to subscribe to yourself.'},
+                {'errors': 'You are already following this user.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Subscription.objects.create(user=request.user, author=author)
+        author.is_subscribed = True
         serializer = SubscriptionSerializer(
             author,
             context={
@@ -89,6 +246,41 @@ class UserViewSet(
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='subscribe',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def subscribe_many(self, request):
+        return self.add_or_remove_many(relations.subscriptions, request)
+
+
+class MetricsView(views.APIView):
+    """View for the request histograms and the response cache statistics."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.METRICS_SAMPLE_RATE,
+            **collect_metrics(),
+        })
+
+
+class PrometheusMetricsView(views.APIView):
+    """View for the metrics in the Prometheus format."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        metrics = collect_metrics()
+        return HttpResponse(
+            routes_prometheus(metrics['routes'])
+            + caches_prometheus(metrics['caches']),
+            content_type=PROMETHEUS_CONTENT_TYPE
+        )
+
 
 class SelfUserView(views.APIView):
     """View class for the current user displaying."""
@@ -123,7 +315,7 @@ class SetPasswordRetypeView(views.APIView):
         )
         if serializer.is_valid():
             self.request.user.set_password(serializer.data['new_password'])
-            self.request.user.save()
+            self.request.user.save(update_fields=['password'])
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -136,6 +328,11 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'json':
+            return tags_payload.get_response(request)
+        return super().list(request, *args, **kwargs)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Viewset for ingredients display."""
@@ -147,16 +344,109 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [rf_filters.DjangoFilterBackend]
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', '').strip()
+        if name:
+            return Response(ingredient_index.search(name))
+        if request.accepted_renderer.format == 'json':
+            return ingredients_payload.get_response(request)
+        return super().list(request, *args, **kwargs)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    BulkRelationMixin, OptionalCursorPaginationMixin, ValuesReadMixin,
+    viewsets.ModelViewSet
+):
     """Viewset for recipes."""
 
     http_method_names = ['get', 'post', 'patch', 'delete']
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    cursor_pagination_classes = {'list': RecipeCursorPagination}
     filter_backends = [rf_filters.DjangoFilterBackend]
     filterset_class = RecipeFilter
+    values_fields = RECIPE_VALUES
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.select_related('author')
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipeingredients',
+                    queryset=RecipeIngredients.objects.select_related(
+                        'ingredient')
+                )
+            )
+        if user.is_anonymous:
+            return queryset.annotate(
+                favorited=Value(False),
+                in_shopping_cart=Value(False),
+            )
+        return queryset.annotate(
+            favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def represent(self, rows):
+        return represent_recipes(
+            rows, self.request, 'card' if self.action == 'list' else None)
+
+    def get_cache_entry(self, request):
+        """Returns the response cache key and groups of the request.
+
+        Only the JSON responses for anonymous users are cached, since
+        they do not depend on who is asking.
+        """
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return None
+        if self.action == 'list':
+            key, groups = recipe_cache.list_entry(request.query_params)
+        elif self.kwargs['pk'].isdigit():
+            key, groups = recipe_cache.detail_entry(int(self.kwargs['pk']))
+        else:
+            return None
+        if accepts_webp(request):
+            key += ':webp'
+        return key, groups
+
+    def get_cached_response(self, request, handler, *args, **kwargs):
+        self.cache_entry = self.get_cache_entry(request)
+        if self.cache_entry is None:
+            return handler(request, *args, **kwargs)
+        content = recipe_cache.get(self.cache_entry[0])
+        if content is None:
+            return handler(request, *args, **kwargs)
+        self.cache_entry = None
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().retrieve, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        cache_entry = getattr(self, 'cache_entry', None)
+        if cache_entry is not None and response.status_code == 200:
+            key, groups = cache_entry
+            recipe_cache.set(
+                key, groups + recipe_cache.author_groups(response.data),
+                response.render().content)
+            response['X-Cache'] = 'MISS'
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -169,23 +459,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeCreateSerializer
         return RecipeSerializer
 
-    def create_delete_or_scold(self, model, recipe, request):
-        instance = model.objects.filter(recipe=recipe, user=request.user)
-        name = model.__name__
-        if request.method == 'DELETE' and not instance:
+    def create_delete_or_scold(self, relation, request, pk):
+        """Adds or removes the recipe with a single INSERT or DELETE.
+
+        The unique constraint tells whether the recipe was already on the
+        list, so concurrent requests for the same recipe cannot fail.
+        """
+        name = relation.model.__name__
+        if request.method == 'DELETE':
+            if relation.remove(request.user, [int(pk)]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, id=pk)
             return Response(
                 {'errors': f'This recipe was not on your {name} list.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if request.method == 'DELETE':
-            instance.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        if instance:
+        recipe = get_object_or_404(Recipe, id=pk)
+        if not relation.add(request.user, [recipe.pk]):
             return Response(
                 {'errors': f'This recipe was already on your {name} list.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.create(user=request.user, recipe=recipe)
         serializer = RecipeLightSerializer(
             recipe,
             context={
@@ -202,8 +496,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        return self.create_delete_or_scold(Favorite, recipe, request)
+        return self.create_delete_or_scold(relations.favorites, request, pk)
 
     @action(
         methods=['post', 'delete'],
@@ -211,68 +504,84 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        return self.create_delete_or_scold(ShoppingCart, recipe, request)
+        return self.create_delete_or_scold(
+            relations.shopping_cart, request, pk)
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def favorite_many(self, request):
+        return self.add_or_remove_many(relations.favorites, request)
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_many(self, request):
+        return self.add_or_remove_many(
+            relations.shopping_cart, request, allow_clear=True)
 
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def download_shopping_cart(self, request):
-        header_font_size = 20
-        body_font_size = 15
-        header_left_margin = 100
-        body_left_margin = 80
-        header_height = 770
-        body_first_line_height = 740
-        line_spacing = 20
-        bottom_margin = 100
-        bullet_point_symbol = u'\u2022'
-
-        recipes_ingredients = RecipeIngredients.objects.filter(
-            recipe__shopping__user=request.user).order_by('ingredient')
-        cart = recipes_ingredients.values(
-            'ingredient__name', 'ingredient__measurement_unit',
-        ).annotate(total=Sum('amount'))
-
-        shopping_list = []
-        for ingredient in cart:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            total = ingredient['total']
-            line = bullet_point_symbol + f' {name} - {total} {unit}'
-            recipes = recipes_ingredients.filter(ingredient__name=name)
-            recipes_names = [
-                (item.recipe.name, item.amount) for item in recipes]
-            shopping_list.append((line, recipes_names))
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="shopping.pdf"'
-        paper_sheet = canvas.Canvas(response, pagesize=A4)
-        registerFont(TTFont('FreeSans', 'FreeSans.ttf'))
-
-        paper_sheet.setFont('FreeSans', header_font_size)
-        paper_sheet.drawString(
-            header_left_margin, header_height, 'Список покупок')
-
-        paper_sheet.setFont('FreeSans', body_font_size)
-        y_coordinate = body_first_line_height
-        for ingredient, recipes_names in shopping_list:
-            paper_sheet.drawString(body_left_margin, y_coordinate, ingredient)
-            y_coordinate -= line_spacing
-
-            for recipe_name in recipes_names:
-                if y_coordinate <= bottom_margin:
-                    paper_sheet.showPage()
-                    y_coordinate = body_first_line_height
-                    paper_sheet.setFont('FreeSans', body_font_size)
-                recipe_line = f'  {recipe_name[0]} ({recipe_name[1]})'
-                paper_sheet.drawString(
-                    body_left_margin, y_coordinate, recipe_line)
-                y_coordinate -= line_spacing
-
-            if y_coordinate <= bottom_margin:
-                paper_sheet.showPage()
-                y_coordinate = body_first_line_height
-                paper_sheet.setFont('FreeSans', body_font_size)
-
-        paper_sheet.showPage()
-        paper_sheet.save()
+        user = request.user
+        version = get_shopping_cart_version(user)
+        etag = get_shopping_list_etag(user, version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            document = get_cached_document(user, version)
+            if document is None:
+                response = StreamingHttpResponse(
+                    cache_document(
+                        user, version,
+                        render_shopping_list(get_shopping_list(user))),
+                    content_type='application/pdf'
+                )
+            else:
+                response = HttpResponse(
+                    document, content_type='application/pdf')
+            response['Content-Disposition'] = (
+                'attachment; filename="shopping.pdf"')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
+
+    @action(
+        methods=['post'],
+        detail=False,
+        url_path='download_shopping_cart/jobs',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def export_shopping_cart(self, request):
+        file_format = request.data.get('format', 'pdf')
+        if file_format not in EXPORT_RENDERERS:
+            return Response(
+                {'errors': f'Choose one of the formats: '
+                           f'{", ".join(EXPORT_RENDERERS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job = export_shopping_list.delay(
+            user_id=request.user.pk, file_format=file_format)
+        serializer = ShoppingListExportSerializer(
+            job, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(
+        detail=False,
+        url_path=r'download_shopping_cart/jobs/(?P<job_id>\d+)',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_export(self, request, job_id):
+        job = get_object_or_404(
+            Task,
+            pk=job_id,
+            name=export_shopping_list.task_name,
+            kwargs__user_id=request.user.pk
+        )
+        serializer = ShoppingListExportSerializer(
+            job, context=self.get_serializer_context())
+        return Response(serializer.data)
@@ -58,9 +58,13 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
+    'sorl.thumbnail',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -164,9 +168,99 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.BrowsableAPIRenderer',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPageNumberPagination',
     'PAGE_SIZE': 6,
 }
+
+# Maximum total size in bytes of the rendered shopping lists kept in memory
+# by every worker process
+SHOPPING_LIST_CACHE_SIZE = 32 * 1024 * 1024
+
+# Seconds after which every worker process rebuilds its ingredient search
+# index to pick up changes made by other processes
+INGREDIENT_INDEX_MAX_AGE = 300
+
+# Seconds after which every worker process re-renders its tags and
+# ingredients lists to pick up changes made by other processes
+REFERENCE_DATA_MAX_AGE = 300
+
+# Maximum total size in bytes of the recipe responses for anonymous users
+# kept in memory by every worker process, seconds after which they expire
+# to pick up changes made by other processes, and number of invalidation
+# groups, such as authors and tags, tracked before all the responses are
+# dropped
+RECIPE_CACHE_SIZE = 16 * 1024 * 1024
+RECIPE_CACHE_TIMEOUT = 60
+RECIPE_CACHE_MAX_GROUPS = 10000
+
+# Number of object counts of paginated queries kept in memory by every
+# worker process, and seconds after which they are counted again
+PAGINATION_COUNT_CACHE_SIZE = 1000
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# Number of API tokens kept with their users in memory by every worker
+# process and seconds after which they are checked again. A token deleted
+# on logout, or a user deactivated or given a new password, is only dropped
+# from the memory of the process handling the change: the other processes
+# accept the old token for up to AUTH_TOKEN_CACHE_TIMEOUT seconds, which is
+# kept short for this reason. Set the alias of a Django cache shared between
+# processes, such as a memcached one, to drop them everywhere at once.
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TIMEOUT = 5
+AUTH_TOKEN_CACHE_ALIAS = None
+
+# API responses of at least COMPRESSION_MIN_SIZE bytes are compressed with
+# brotli or gzip at these levels, the cached reference lists at the best ones
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Build the recipe, user and subscription lists and details from .values()
+# rows instead of serializers, with the same output
+API_FAST_READS = True
+
+# Maximum number of recipes or authors added or removed by a bulk request
+BULK_ACTION_MAX_IDS = 500
+
+# Recipe images are downscaled to fit RECIPE_IMAGE_MAX_SIZE pixels and
+# pre-rendered in every thumbnail size, as JPEG and WebP
+RECIPE_IMAGE_MAX_SIZE = 1600
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_THUMBNAILS = {
+    'card': '480x320',
+    'small': '144x144',
+}
+
+# Seconds an uploaded recipe image is kept after it is replaced by the
+# normalized one, at least RECIPE_CACHE_TIMEOUT so that the responses
+# cached by other worker processes never link to a deleted file
+RECIPE_IMAGE_DELETE_DELAY = 300
+
+# Background tasks: seconds a worker may run a task before other workers
+# take it over, seconds to wait for new tasks, and the first retry delay
+# in seconds, doubled on every next attempt
+TASKS_VISIBILITY_TIMEOUT = 300
+TASKS_POLL_INTERVAL = 1
+TASKS_RETRY_DELAY = 10
+# Seconds finished tasks, with the files they produced such as the shopping
+# list exports, are kept, and seconds between the deletions of older ones
+TASKS_RETENTION = 24 * 60 * 60
+TASKS_CLEANUP_INTERVAL = 60 * 60
+
+# Share of the requests measured by the Server-Timing middleware and added
+# to the per-route histograms of every worker process, from 0 to 1
+METRICS_SAMPLE_RATE = 0.1
+# Directory where every worker process saves its metrics, at most once every
+# METRICS_FLUSH_INTERVAL seconds, for the metrics views to add them up. It
+# must be shared by the processes of a server; without it only the process
+# answering the scrape is reported
+METRICS_DIR = os.getenv('METRICS_DIR', default='/tmp/foodgram-metrics')
+METRICS_FLUSH_INTERVAL = 10
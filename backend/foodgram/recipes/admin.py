@@ -17,17 +17,13 @@ class RecipeAdmin(admin.ModelAdmin):
 
     list_display = [
         'pk', 'name', 'author', 'text', 'cooking_time',
-        'total_favorites', 'pub_date']
+        'favorites_count', 'in_carts_count', 'pub_date']
     search_fields = ['name', 'author', 'cooking_time', 'text']
-    readonly_fields = ['total_favorites']
+    readonly_fields = ['favorites_count', 'in_carts_count']
     list_filter = ['name', 'pub_date', 'author', 'tags']
     empty_value_display = '-empty-'
     inlines = [RecipeIngredientsInline]
 
-    @admin.display(description='Total favorites')
-    def total_favorites(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
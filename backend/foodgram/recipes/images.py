@@ -0,0 +1,47 @@
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+THUMBNAIL_FORMATS = {'jpeg': 'JPEG', 'webp': 'WEBP'}
+
+
+def normalize_image(image):
+    """Returns the uploaded image upright, downscaled and saved as JPEG."""
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    with Image.open(image) as picture:
+        picture = ImageOps.exif_transpose(picture)
+        picture.thumbnail((max_size, max_size))
+        if picture.mode != 'RGB':
+            picture = picture.convert('RGBA')
+            background = Image.new('RGB', picture.size, 'white')
+            background.paste(picture, mask=picture.getchannel('A'))
+            picture = background
+        buffer = BytesIO()
+        picture.save(
+            buffer, 'JPEG', quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True, progressive=True)
+    return ContentFile(
+        buffer.getvalue(), name=Path(image.name).with_suffix('.jpg').name)
+
+
+def make_thumbnails(image):
+    """Renders the image in every thumbnail size and format.
+
+    Returns the storage names of the thumbnails by size and format, so
+    their URLs are built without touching the storage or the thumbnail
+    key-value store.
+    """
+    return {
+        size: {
+            image_format: get_thumbnail(
+                image, geometry, crop='center', format=engine_format,
+                quality=settings.RECIPE_IMAGE_QUALITY
+            ).name
+            for image_format, engine_format in THUMBNAIL_FORMATS.items()
+        }
+        for size, geometry in settings.RECIPE_THUMBNAILS.items()
+    }
@@ -0,0 +1,207 @@
+import random
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+PRESETS = {
+    'small': {'users': 100, 'recipes': 1_000},
+    'default': {'users': 10_000, 'recipes': 100_000},
+    'large': {'users': 100_000, 'recipes': 1_000_000},
+}
+USERNAME_PREFIX = 'dataset_user_'
+PASSWORD = 'dataset-password'
+TAGS = [
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+]
+WORDS = (
+    'свежий домашний быстрый пряный сладкий сытный лёгкий запечённый '
+    'суп салат пирог соус рагу каша омлет паста десерт запеканка'
+).split()
+
+
+class Command(BaseCommand):
+    """Generates a reproducible synthetic dataset for benchmarks."""
+
+    help = (
+        'Generates users, subscriptions, recipes with tags and ingredients, '
+        'favorites and shopping carts with bulk inserts. The same seed '
+        'always produces the same dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset', choices=PRESETS, default='default',
+            help='Dataset size preset.')
+        parser.add_argument(
+            '--users', type=int, help='Number of users, overrides preset.')
+        parser.add_argument(
+            '--recipes', type=int,
+            help='Number of recipes, overrides preset.')
+        parser.add_argument(
+            '--subscriptions', type=int, default=5,
+            help='Average number of authors every user follows.')
+        parser.add_argument(
+            '--favorites', type=int, default=10,
+            help='Average number of favorite recipes of every user.')
+        parser.add_argument(
+            '--cart', type=int, default=3,
+            help='Average number of recipes in every shopping cart.')
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5_000,
+            help='Number of rows in every INSERT.')
+        parser.add_argument(
+            '--flush', action='store_true',
+            help='Delete the previously generated dataset first.')
+
+    def handle(self, *args, **options):
+        preset = PRESETS[options['preset']]
+        self.users_count = options['users'] or preset['users']
+        self.recipes_count = options['recipes'] or preset['recipes']
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+
+        if options['flush']:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError(
+                'The dataset is already generated, use --flush to replace it.')
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'No ingredients found, run load_ingredients first.')
+
+        with transaction.atomic():
+            self.step('tags', self.create_tags)
+            self.step('users', self.create_users)
+            self.step(
+                'subscriptions', self.create_subscriptions,
+                options['subscriptions'])
+            self.step('recipes', self.create_recipes)
+            self.step(
+                'favorites', self.create_user_recipes, Favorite,
+                options['favorites'])
+            self.step(
+                'shopping carts', self.create_user_recipes, ShoppingCart,
+                options['cart'])
+        # Bulk inserts send no signals, so the counters are filled here.
+        call_command('recount', stdout=self.stdout)
+
+    def step(self, name, method, *args):
+        start = perf_counter()
+        count = method(*args)
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f'{name}: {count} rows in {elapsed:.1f} s '
+            f'({count / max(elapsed, 1e-6):.0f} rows/s)'
+        )
+
+    def bulk_create(self, model, objects):
+        batch, count = [], 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                count += len(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            count += len(model.objects.bulk_create(batch))
+        return count
+
+    def create_tags(self):
+        existing = set(Tag.objects.values_list('slug', flat=True))
+        Tag.objects.bulk_create(
+            [
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS if slug not in existing
+            ],
+            ignore_conflicts=True
+        )
+        self.tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        return len(self.tag_ids)
+
+    def create_users(self):
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@foodgram.local',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(self.users_count)
+        ))
+        self.user_ids = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+        return len(self.user_ids)
+
+    def sample_pairs(self, average, targets, exclude_self=False):
+        for user_id in self.user_ids:
+            count = min(
+                self.random.randint(0, 2 * average), len(targets) - 1)
+            for target in self.random.sample(targets, count):
+                if not exclude_self or target != user_id:
+                    yield user_id, target
+
+    def create_subscriptions(self, average):
+        return self.bulk_create(Subscription, (
+            Subscription(user_id=user_id, author_id=author_id)
+            for user_id, author_id in self.sample_pairs(
+                average, self.user_ids, exclude_self=True)
+        ))
+
+    def create_recipes(self):
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        recipe_ids = []
+        count = 0
+        for start in range(0, self.recipes_count, self.batch_size):
+            stop = min(start + self.batch_size, self.recipes_count)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=self.random.choice(self.user_ids),
+                    name=' '.join(self.random.sample(WORDS, 3)).capitalize()
+                    + f' №{number}',
+                    image='recipes/dataset.png',
+                    text=' '.join(self.random.choices(WORDS, k=60)),
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for number in range(start, stop)
+            )
+            count += len(recipes)
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            count += self.bulk_create(Recipe.tags.through, (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in self.random.sample(
+                    self.tag_ids, self.random.randint(1, len(self.tag_ids)))
+            ))
+            count += self.bulk_create(RecipeIngredients, (
+                RecipeIngredients(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in self.random.sample(
+                    ingredient_ids, self.random.randint(3, 12))
+            ))
+        self.recipe_ids = recipe_ids
+        return count
+
+    def create_user_recipes(self, model, average):
+        return self.bulk_create(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in self.sample_pairs(
+                average, self.recipe_ids)
+        ))
@@ -1,37 +1,191 @@
-from csv import DictReader
+import csv
+import json
 from pathlib import Path
+from time import perf_counter
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from foodgram.settings import BASE_DIR
 from recipes.models import Ingredient
-
-ALREDY_LOADED_ERROR_MESSAGE = """
-If you need to reload the ingredients data from the CSV file,
-first delete the db.sqlite3 file to destroy the database.
-Then, run `python manage.py migrate` for a new empty
-database with tables"""
+from recipes.signals import bump_shopping_cart_versions
+from users.models import User
 
 DATA_FILE_PATH = Path(
     # Path for local development:
     # Path(BASE_DIR).parent.parent, 'data', 'recipes_ingredient.csv')
     Path(BASE_DIR), 'recipes_ingredient.csv')
+FIELDS = ['name', 'measurement_unit']
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Yields ingredient rows of a CSV file with or without a header."""
+    reader = csv.reader(file)
+    for row in reader:
+        if row == FIELDS:
+            continue
+        if len(row) >= 2:
+            yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def read_array_start(file):
+    """Reads the file past the opening bracket and returns what follows."""
+    buffer = ''
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer = (buffer + chunk).lstrip()
+        if buffer:
+            if buffer[0] != '[':
+                raise CommandError('JSON data must be an array.')
+            return buffer[1:]
+        if not chunk:
+            raise CommandError('Unexpected end of JSON data.')
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def read_json(file):
+    """Yields the objects of a JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, position = read_array_start(file), 0
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            position = skip_separators(buffer, position)
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Unexpected end of JSON data.')
+                break
+            yield item
+        if not chunk:
+            return
 
 
 class Command(BaseCommand):
-    """Loads ingredients data from csv file to database."""
+    """Loads ingredients data from a CSV or JSON file to database."""
 
-    help = 'Loads ingredients data from csv file to database'
+    help = (
+        'Loads ingredients data from a CSV or JSON file to database. '
+        'Ingredients that are already loaded are skipped, so the command '
+        'can be run again at any time; with --sync it also updates their '
+        'measurement units.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DATA_FILE_PATH,
+            help='Path of the CSV or JSON file.')
+        parser.add_argument(
+            '--format', choices=['csv', 'json'],
+            help='File format, guessed from the file extension by default.')
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Update the measurement unit of the ingredients loaded '
+                 'once when the file lists only a new unit for them.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows in every INSERT or UPDATE.')
 
     def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        readers = {'csv': read_csv, 'json': read_json}
+        if file_format not in readers:
+            raise CommandError(f'Unknown file format: {file_format}.')
 
-        if Ingredient.objects.exists():
-            self.stderr.write('Ingredients data already loaded...exiting.')
-            self.stderr.write(ALREDY_LOADED_ERROR_MESSAGE)
-            return
+        self.stdout.write(f'Loading ingredients data from {path}')
+        start = perf_counter()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            counts = self.load(
+                readers[file_format](file), options['sync'],
+                options['batch_size'])
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f'Read {counts["read"]} rows in {elapsed:.2f} s '
+            f'({counts["read"] / max(elapsed, 1e-6):.0f} rows/s): '
+            f'{counts["created"]} created, {counts["updated"]} updated, '
+            f'{counts["skipped"]} already loaded.'
+        )
+
+    def load(self, rows, sync, batch_size):
+        loaded = {}
+        for pk, name, unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'):
+            loaded.setdefault(name, []).append((pk, unit))
+        loaded_pairs = {
+            (name, unit)
+            for name, ingredients in loaded.items()
+            for _, unit in ingredients
+        }
+        pairs = set(loaded_pairs)
+        # Only a name loaded once is unambiguous enough to update. Its new
+        # units are collected and chosen from once the whole file is read.
+        new_units, kept_names = {}, set()
+
+        counts = {'read': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        to_create = []
+        for row in rows:
+            counts['read'] += 1
+            name = row['name'].strip()
+            unit = row['measurement_unit'].strip()
+            if (name, unit) in loaded_pairs:
+                kept_names.add(name)
+            if (name, unit) in pairs:
+                counts['skipped'] += 1
+                continue
+            pairs.add((name, unit))
+            if sync and len(loaded.get(name, ())) == 1:
+                new_units.setdefault(name, []).append(unit)
+                continue
+            to_create.append(Ingredient(name=name, measurement_unit=unit))
+            if len(to_create) >= batch_size:
+                counts['created'] += self.create(to_create)
+        counts['created'] += self.create(to_create)
+        self.sync(loaded, new_units, kept_names, batch_size, counts)
+        return counts
+
+    def sync(self, loaded, new_units, kept_names, batch_size, counts):
+        """Updates the unit of the names loaded once, or adds the units."""
+        to_create, to_update = [], []
+        for name, units in new_units.items():
+            if name in kept_names or len(units) > 1:
+                # The file also lists the loaded unit, or several new ones:
+                # the loaded ingredient stays and the new units are added.
+                to_create.extend(
+                    Ingredient(name=name, measurement_unit=unit)
+                    for unit in units)
+            else:
+                to_update.append(Ingredient(
+                    pk=loaded[name][0][0], name=name,
+                    measurement_unit=units[0]))
+            if len(to_create) >= batch_size:
+                counts['created'] += self.create(to_create)
+            if len(to_update) >= batch_size:
+                counts['updated'] += self.update(to_update)
+        counts['created'] += self.create(to_create)
+        counts['updated'] += self.update(to_update)
 
-        self.stdout.write('Loading ingredients data')
+    def create(self, ingredients):
+        """Inserts and empties the batch, returns the number of rows."""
+        batch = ingredients[:]
+        ingredients.clear()
+        return len(Ingredient.objects.bulk_create(batch))
 
-        for row in DictReader(open(DATA_FILE_PATH, encoding='utf-8')):
-            ingr = Ingredient(
-                name=row['name'], measurement_unit=row['measurement_unit'])
-            ingr.save()
+    def update(self, ingredients):
+        """Updates and empties the batch, returns the number of rows."""
+        batch = ingredients[:]
+        ingredients.clear()
+        Ingredient.objects.bulk_update(batch, ['measurement_unit'])
+        bump_shopping_cart_versions(User.objects.filter(
+            shopping__recipe__ingredients__in=batch))
+        return len(batch)
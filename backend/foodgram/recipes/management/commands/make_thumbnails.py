@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from recipes.images import make_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Renders the thumbnails of the recipe images that have none."""
+
+    help = (
+        'Renders the thumbnails of the recipe images saved before they '
+        'were generated on upload, or of all the images with --all.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Render the thumbnails of all the recipe images again.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only('pk', 'image')
+        if not options['all']:
+            recipes = recipes.filter(thumbnails={})
+        rendered = failed = 0
+        for recipe in recipes.iterator():
+            if not recipe.image.storage.exists(recipe.image.name):
+                failed += 1
+                self.stderr.write(
+                    f'Recipe {recipe.pk}: {recipe.image.name} not found')
+                continue
+            Recipe.objects.filter(pk=recipe.pk).update(
+                thumbnails=make_thumbnails(recipe.image))
+            rendered += 1
+        self.stdout.write(f'{rendered} rendered, {failed} failed')
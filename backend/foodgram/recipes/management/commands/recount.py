@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+def count_related(model, field):
+    """Returns the number of model rows referring to the outer object."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+COUNTERS = [
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+]
+
+
+class Command(BaseCommand):
+    """Recounts the denormalized counters of recipes and users."""
+
+    help = (
+        'Recounts favorites and shopping carts of every recipe, recipes '
+        'and followers of every user, and fixes the counters that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows in every UPDATE.')
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            with transaction.atomic():
+                drifted = [
+                    model(pk=pk, **{field: actual})
+                    for pk, actual in model.objects.annotate(
+                        actual=count_related(related_model, related_field)
+                    ).exclude(**{field: F('actual')}).values_list(
+                        'pk', 'actual')
+                ]
+                model.objects.bulk_update(
+                    drifted, [field], batch_size=options['batch_size'])
+            self.stdout.write(
+                f'{model.__name__}.{field}: {len(drifted)} fixed')
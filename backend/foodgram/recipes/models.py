@@ -1,6 +1,9 @@
 from django.db import models
+from tasks.queue import enqueue
 from users.models import User
 
+PROCESS_IMAGE_TASK = 'recipes.tasks.process_recipe_image'
+
 
 class Tag(models.Model):
     """Class to store recipe tags in the database."""
@@ -55,11 +58,23 @@ class Recipe(models.Model):
     text = models.TextField('Text')
     cooking_time = models.PositiveIntegerField('Cooking time')
     pub_date = models.DateTimeField('Publication Date', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'Favorites count', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        'Shopping carts count', default=0, editable=False)
+    thumbnails = models.JSONField(
+        'Thumbnails', default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'name'],
@@ -67,6 +82,18 @@ class Recipe(models.Model):
             )
         ]
 
+    def save(self, *args, **kwargs):
+        image_uploaded = bool(self.image) and not self.image._committed
+        if image_uploaded:
+            self.thumbnails = {}
+        super().save(*args, **kwargs)
+        if image_uploaded:
+            enqueue(
+                PROCESS_IMAGE_TASK,
+                recipe_id=self.pk,
+                image_name=self.image.name
+            )
+
     def is_favorited(self, user):
         return self.favorites.filter(user=user).exists()
 
@@ -0,0 +1,66 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from users.models import User
+
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                     ShoppingCart)
+
+# Sent with the recipe as instance once its uploaded image is replaced by
+# the normalized one, which is saved without the model signals.
+recipe_image_processed = Signal()
+
+
+def bump_shopping_cart_versions(users):
+    """Marks the shopping lists of the users as changed."""
+    users.update(shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def change_counter(queryset, field, signal, created=False):
+    """Atomically counts a created or deleted row in the queryset rows."""
+    if signal is post_delete:
+        queryset.filter(**{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+    elif created:
+        queryset.update(**{field: F(field) + 1})
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, signal, created=False, **kwargs):
+    bump_shopping_cart_versions(User.objects.filter(pk=instance.user_id))
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'in_carts_count',
+        signal, created)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, signal, created=False, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count',
+        signal, created)
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    bump_shopping_cart_versions(
+        User.objects.filter(shopping__recipe=instance.recipe_id))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, signal, created=False, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count',
+        signal, created)
+    if signal is post_save and not created:
+        bump_shopping_cart_versions(
+            User.objects.filter(shopping__recipe=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_shopping_cart_versions(
+            User.objects.filter(shopping__recipe__ingredients=instance))
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from sorl.thumbnail import delete
+from tasks.queue import enqueue, task
+
+from .images import make_thumbnails, normalize_image
+from .models import Recipe
+from .signals import recipe_image_processed
+
+
+@task()
+def process_recipe_image(recipe_id, image_name):
+    """Normalizes an uploaded recipe image and renders its thumbnails.
+
+    The uploaded file is replaced with the normalized one unless the
+    recipe was deleted or got another image in the meantime. The cached
+    responses of the recipe are purged, and the uploaded file is only
+    deleted RECIPE_IMAGE_DELETE_DELAY seconds later, once the responses
+    cached by other processes that still link to it have expired.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image_name).first()
+    if recipe is None:
+        return None
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as image:
+        normalized = normalize_image(image)
+    name = storage.save(
+        recipe.image.field.generate_filename(recipe, normalized.name),
+        normalized)
+    try:
+        thumbnails = make_thumbnails(name)
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image=name, thumbnails=thumbnails)
+    except Exception:
+        delete(name)
+        raise
+    if not updated:
+        delete(name)
+        return None
+    recipe.image, recipe.thumbnails = name, thumbnails
+    recipe_image_processed.send(sender=Recipe, instance=recipe)
+    enqueue(
+        delete_recipe_image.task_name,
+        run_at=timezone.now() + timedelta(
+            seconds=settings.RECIPE_IMAGE_DELETE_DELAY),
+        image_name=image_name,
+    )
+    return {'image': name, 'thumbnails': thumbnails}
+
+
+@task()
+def delete_recipe_image(image_name):
+    """Deletes a replaced recipe image unless a recipe uses it again."""
+    if Recipe.objects.filter(image=image_name).exists():
+        return None
+    Recipe._meta.get_field('image').storage.delete(image_name)
+    return {'deleted': image_name}
@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from api.recipe_cache import recipe_cache
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from tasks.models import Task
+from users.models import User
+
+from .models import Ingredient, Recipe, RecipeIngredients, ShoppingCart
+from .tasks import delete_recipe_image, process_recipe_image
+
+
+class ShoppingCartVersionTest(TestCase):
+    """Changes to the recipes in a cart bump the cart version."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='First', last_name='Last', password='password')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Recipe', image='recipes/recipe.jpg',
+            text='Text', cooking_time=10)
+        cls.ingredient = Ingredient.objects.create(
+            name='Ingredient', measurement_unit='g')
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def get_version(self):
+        return User.objects.get(pk=self.user.pk).shopping_cart_version
+
+    def test_ingredient_added_and_deleted(self):
+        version = self.get_version()
+        recipe_ingredient = RecipeIngredients.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1)
+        self.assertEqual(self.get_version(), version + 1)
+        recipe_ingredient.delete()
+        self.assertEqual(self.get_version(), version + 2)
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='upload.png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProcessRecipeImageTest(TestCase):
+    """The image task replaces the upload without serving stale links."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        recipe_cache.clear()
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='First', last_name='Last', password='password')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Recipe', image=make_image(),
+            text='Text', cooking_time=10)
+        self.upload = self.recipe.image.name
+        self.storage = self.recipe.image.storage
+        self.client = APIClient()
+
+    def get_image_url(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['image'], response['X-Cache']
+
+    def test_cached_responses_purged_and_upload_kept(self):
+        self.get_image_url()
+        self.assertEqual(self.get_image_url()[1], 'HIT')
+        result = process_recipe_image(self.recipe.pk, self.upload)
+        url, cache_status = self.get_image_url()
+        self.assertEqual(cache_status, 'MISS')
+        self.assertTrue(url.endswith(result['image']))
+        # Responses cached by other processes may still link the upload.
+        self.assertTrue(self.storage.exists(self.upload))
+        task = Task.objects.get(name=delete_recipe_image.task_name)
+        self.assertEqual(task.kwargs, {'image_name': self.upload})
+        delete_recipe_image(**task.kwargs)
+        self.assertFalse(self.storage.exists(self.upload))
+
+    def test_normalized_image_deleted_on_failure(self):
+        files = self.storage.listdir('recipes')[1]
+        with mock.patch(
+            'recipes.tasks.make_thumbnails', side_effect=OSError
+        ), self.assertRaises(OSError):
+            process_recipe_image(self.recipe.pk, self.upload)
+        self.assertEqual(self.storage.listdir('recipes')[1], files)
+
+
+class LoadIngredientsTest(TestCase):
+    """load_ingredients can be run again at any time, with --sync too."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def load(self, rows, sync=True):
+        path = Path(self.directory, 'ingredients.csv')
+        path.write_text(
+            ''.join(f'{name},{unit}\n' for name, unit in rows),
+            encoding='utf-8')
+        args = [str(path), '--batch-size=2'] + (['--sync'] if sync else [])
+        call_command('load_ingredients', *args, stdout=StringIO())
+
+    def get_ingredients(self):
+        return set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'))
+
+    def test_shipped_data_on_empty_database(self):
+        path = Path(settings.BASE_DIR).parent.parent / 'data'
+        for file_name in ('ingredients.csv', 'ingredients.json'):
+            Ingredient.objects.all().delete()
+            with self.subTest(file_name=file_name):
+                call_command(
+                    'load_ingredients', str(path / file_name), '--sync',
+                    stdout=StringIO())
+                self.assertEqual(
+                    Ingredient.objects.count(), len(self.get_ingredients()))
+
+    def test_reload(self):
+        rows = [('соль', 'г'), ('мука', 'г'), ('яйца', 'шт.')]
+        self.load(rows, sync=False)
+        pks = list(Ingredient.objects.values_list('pk', flat=True))
+        self.load(rows)
+        self.assertEqual(
+            list(Ingredient.objects.values_list('pk', flat=True)), pks)
+
+    def test_unit_change(self):
+        self.load([('соль', 'г'), ('мука', 'г')])
+        salt = Ingredient.objects.get(name='соль')
+        self.load([('соль', 'щепотка'), ('мука', 'г')], sync=False)
+        self.assertEqual(self.get_ingredients(), {
+            ('соль', 'г'), ('соль', 'щепотка'), ('мука', 'г')})
+        Ingredient.objects.filter(measurement_unit='щепотка').delete()
+        self.load([('соль', 'щепотка'), ('мука', 'г')])
+        salt.refresh_from_db()
+        self.assertEqual(salt.measurement_unit, 'щепотка')
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_duplicate_names(self):
+        self.load([
+            ('пекарский порошок', 'г'), ('пекарский порошок', 'ч. л.'),
+            ('пекарский порошок', 'г'),
+        ])
+        self.assertEqual(self.get_ingredients(), {
+            ('пекарский порошок', 'г'), ('пекарский порошок', 'ч. л.')})
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_second_unit_of_loaded_name_is_added(self):
+        self.load([('стейк семги', 'г')])
+        self.load([('стейк семги', 'шт.'), ('стейк семги', 'г')])
+        self.assertEqual(self.get_ingredients(), {
+            ('стейк семги', 'г'), ('стейк семги', 'шт.')})
+        self.load([('стейк семги', 'кг'), ('стейк семги', 'по вкусу')])
+        self.assertEqual(Ingredient.objects.count(), 4)
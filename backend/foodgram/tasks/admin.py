@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Class to customize background tasks display in admin panel."""
+
+    list_display = [
+        'pk', 'name', 'status', 'attempts', 'run_at', 'created', 'finished']
+    search_fields = ['name']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created', 'finished', 'locked_until', 'last_error']
@@ -0,0 +1,106 @@
+import logging
+import multiprocessing
+import signal
+import threading
+from time import monotonic
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import (DatabaseError, close_old_connections, connection,
+                       connections)
+from tasks.queue import claim_task, delete_finished_tasks, run_task
+
+logger = logging.getLogger(__name__)
+
+
+def work(stop, poll_interval, once, clean_up=False):
+    """Runs the due tasks one by one until stopped.
+
+    With once set, the worker exits as soon as no task is due. With
+    clean_up set, the worker also deletes the old finished tasks every
+    TASKS_CLEANUP_INTERVAL seconds.
+    """
+    next_cleanup = monotonic()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if clean_up and monotonic() >= next_cleanup:
+                    delete_finished_tasks()
+                    next_cleanup = (
+                        monotonic() + settings.TASKS_CLEANUP_INTERVAL)
+                task = claim_task()
+                if task is not None:
+                    run_task(task)
+                    continue
+            except DatabaseError:
+                logger.exception('Task worker database error')
+            else:
+                if once:
+                    return
+            stop.wait(poll_interval)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Runs a pool of background task workers."""
+
+    help = (
+        'Runs background tasks stored in the database with a pool of '
+        'worker threads or processes. Failed tasks are retried with '
+        'exponential backoff, and tasks of workers that died are taken '
+        'over once their visibility timeout expires. Finished tasks are '
+        'deleted after TASKS_RETENTION seconds. Stops gracefully '
+        'on SIGINT or SIGTERM after the running tasks finish.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Number of workers.')
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run workers in processes instead of threads.')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Seconds to wait when no task is due.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no task is due.')
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            # Forked processes must not share the parent's connection.
+            connections.close_all()
+            stop = multiprocessing.Event()
+            worker_class = multiprocessing.Process
+        else:
+            stop = threading.Event()
+            worker_class = threading.Thread
+
+        def shut_down(signum, frame):
+            self.stdout.write('Stopping workers...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shut_down)
+        signal.signal(signal.SIGTERM, shut_down)
+
+        workers = [
+            worker_class(
+                target=work,
+                args=(stop, options['poll_interval'], options['once']),
+                # A single worker of the pool deletes the old tasks.
+                kwargs={'clean_up': number == 0},
+                name=f'task-worker-{number}',
+            )
+            for number in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f'Started {len(workers)} '
+            f'{"processes" if options["processes"] else "threads"}')
+        for worker in workers:
+            worker.join()
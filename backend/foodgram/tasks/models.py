@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Class to store background tasks in the database."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField('Name', max_length=200)
+    kwargs = models.JSONField('Arguments', default=dict, blank=True)
+    status = models.CharField(
+        'Status', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField('Attempts', default=0)
+    max_attempts = models.PositiveIntegerField('Max attempts', default=3)
+    timeout = models.PositiveIntegerField('Timeout, seconds', default=300)
+    run_at = models.DateTimeField('Run at', default=timezone.now)
+    locked_until = models.DateTimeField('Locked until', null=True, blank=True)
+    result = models.JSONField('Result', null=True, blank=True)
+    last_error = models.TextField('Last error', blank=True)
+    created = models.DateTimeField('Created', auto_now_add=True)
+    finished = models.DateTimeField('Finished', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Task'
+        verbose_name_plural = 'Tasks'
+        ordering = ['-pk']
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='task_status_run_at_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,122 @@
+import logging
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name=None, max_attempts=3, timeout=None):
+    """Registers the function as a background task.
+
+    The decorated function keeps working as usual and gets a delay()
+    method, which stores a task to call it with the given keyword
+    arguments in a worker started by the run_workers command. Arguments
+    have to be JSON serializable.
+    """
+    def decorator(function):
+        task_name = name or f'{function.__module__}.{function.__name__}'
+        registry[task_name] = function
+
+        @wraps(function)
+        def delay(**kwargs):
+            return enqueue(
+                task_name, max_attempts=max_attempts, timeout=timeout,
+                **kwargs)
+
+        function.task_name = task_name
+        function.delay = delay
+        return function
+    return decorator
+
+
+def enqueue(name, max_attempts=3, timeout=None, run_at=None, **kwargs):
+    """Stores a task for the workers and returns it.
+
+    The task is stored in the current transaction, so workers only see
+    it once the data it works on is committed.
+    """
+    return Task.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        timeout=timeout or settings.TASKS_VISIBILITY_TIMEOUT,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim_task():
+    """Locks the next due task for the current worker and returns it.
+
+    Pending tasks are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent workers never wait for each other. Running tasks whose
+    lock expired are claimed again, as their worker is presumed dead.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        task = Task.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Task.PENDING, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now)
+        ).order_by('run_at').first()
+        if task is None:
+            return None
+        task.status = Task.RUNNING
+        task.attempts += 1
+        task.locked_until = now + timedelta(seconds=task.timeout)
+        task.save(update_fields=['status', 'attempts', 'locked_until'])
+    return task
+
+
+def run_task(task):
+    """Runs the claimed task and records its result or schedules a retry."""
+    # A task is only finished by the worker holding the current attempt.
+    claimed = Task.objects.filter(pk=task.pk, attempts=task.attempts)
+    now = timezone.now()
+    try:
+        if task.attempts > task.max_attempts:
+            raise TimeoutError(
+                f'Task timed out after {task.timeout} seconds.')
+        function = registry.get(task.name)
+        if function is None:
+            raise LookupError(f'Unknown task {task.name}.')
+        result = function(**task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Task %s failed: %s', task, error)
+        if task.attempts < task.max_attempts:
+            delay = settings.TASKS_RETRY_DELAY * 2 ** (task.attempts - 1)
+            claimed.update(
+                status=Task.PENDING, locked_until=None, last_error=error,
+                run_at=now + timedelta(seconds=delay))
+        else:
+            claimed.update(
+                status=Task.FAILED, locked_until=None, last_error=error,
+                finished=timezone.now())
+        return False
+    claimed.update(
+        status=Task.DONE, locked_until=None, result=result,
+        finished=timezone.now())
+    return True
+
+
+def delete_finished_tasks():
+    """Deletes the tasks finished more than TASKS_RETENTION seconds ago.
+
+    Tasks are deleted with their signals, so the files they produced can
+    be deleted along. Returns the number of deleted tasks.
+    """
+    finished_before = timezone.now() - timedelta(
+        seconds=settings.TASKS_RETENTION)
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED], finished__lt=finished_before
+    ).delete()
+    return deleted
@@ -33,6 +33,12 @@ class User(AbstractUser):
         blank=False
     )
     password = models.CharField('Password', max_length=150)
+    shopping_cart_version = models.PositiveIntegerField(
+        'Shopping cart version', default=0, editable=False)
+    recipes_count = models.PositiveIntegerField(
+        'Recipes count', default=0, editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Followers count', default=0, editable=False)
 
     class Meta:
         verbose_name = 'User'
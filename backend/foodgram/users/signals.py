@@ -0,0 +1,16 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, signal, created=False, **kwargs):
+    author = User.objects.filter(pk=instance.author_id)
+    if signal is post_delete:
+        author.filter(followers_count__gt=0).update(
+            followers_count=F('followers_count') - 1)
+    elif created:
+        author.update(followers_count=F('followers_count') + 1)